@@ -0,0 +1,32 @@
+"""add trigram name indexes
+
+Revision ID: 40896840197e
+Revises: e9ba75e21890
+Create Date: 2026-10-18 10:31:47.205913
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '40896840197e'
+down_revision = 'e9ba75e21890'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # trigram GIN indexes serve both the fuzzy `%` search and the default ILIKE '%name%' filter
+    with op.get_context().autocommit_block():
+        op.create_index('ix_athletes_name_trgm', 'athletes', ['name'], postgresql_using='gin',
+                        postgresql_ops={'name': 'gin_trgm_ops'}, postgresql_concurrently=True)
+        op.create_index('ix_teams_team_name_trgm', 'teams', ['team_name'], postgresql_using='gin',
+                        postgresql_ops={'team_name': 'gin_trgm_ops'}, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_teams_team_name_trgm', table_name='teams', postgresql_concurrently=True)
+        op.drop_index('ix_athletes_name_trgm', table_name='athletes', postgresql_concurrently=True)
@@ -0,0 +1,35 @@
+"""add game date indexes
+
+Revision ID: 52a94b7b4943
+Revises: 88de320554b6
+Create Date: 2026-10-18 17:40:21.530184
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '52a94b7b4943'
+down_revision = '88de320554b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # date range scans (/games/search/, nightly jobs). Games are added roughly in date order,
+        # so a BRIN index narrows a range to a few block ranges at a tiny fraction of a btree's size
+        op.create_index('ix_games_date_brin', 'games', ['date'], postgresql_using='brin',
+                        postgresql_concurrently=True)
+        # /games/search/?team_id=: each team's games in (date, game_id) order, at home and away
+        op.create_index('ix_games_home_date', 'games', ['home', 'date', 'game_id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_games_away_date', 'games', ['away', 'date', 'game_id'],
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_games_away_date', table_name='games', postgresql_concurrently=True)
+        op.drop_index('ix_games_home_date', table_name='games', postgresql_concurrently=True)
+        op.drop_index('ix_games_date_brin', table_name='games', postgresql_concurrently=True)
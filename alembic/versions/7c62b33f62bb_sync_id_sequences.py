@@ -0,0 +1,29 @@
+"""sync id sequences
+
+Revision ID: 7c62b33f62bb
+Revises: 40896840197e
+Create Date: 2026-10-18 10:58:02.631574
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7c62b33f62bb'
+down_revision = '40896840197e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the data was loaded with explicit ids, so the serial sequences were never advanced
+    for table, column in [('athletes', 'athlete_id'), ('games', 'game_id')]:
+        op.execute(f'''
+        SELECT setval(pg_get_serial_sequence('{table}', '{column}'), COALESCE(MAX({column}), 0) + 1, false)
+        FROM {table};
+        ''')
+
+
+def downgrade() -> None:
+    # nothing to undo: a sequence ahead of the data is harmless
+    pass
@@ -0,0 +1,34 @@
+"""add athlete stat leader indexes
+
+Revision ID: 88de320554b6
+Revises: c6d21c770f51
+Create Date: 2026-10-18 16:12:09.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '88de320554b6'
+down_revision = 'c6d21c770f51'
+branch_labels = None
+depends_on = None
+
+STATS = ["games_played", "minutes_played", "field_goal_percentage", "free_throw_percentage",
+         "total_rebounds", "assists", "steals", "blocks", "turnovers", "points"]
+
+
+def upgrade() -> None:
+    # /athletes/leaders/: year = ? ORDER BY <stat> DESC, athlete_id LIMIT k reads the first k
+    # entries of one of these, as an index-only scan, however many athletes there are
+    with op.get_context().autocommit_block():
+        for stat in STATS:
+            op.create_index(f'ix_athlete_stats_year_{stat}', 'athlete_stats',
+                            ['year', sa.text(f'{stat} DESC'), 'athlete_id'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for stat in reversed(STATS):
+            op.drop_index(f'ix_athlete_stats_year_{stat}', table_name='athlete_stats', postgresql_concurrently=True)
@@ -0,0 +1,48 @@
+"""max_athlete_stats table
+
+Revision ID: c6d21c770f51
+Revises: 7c62b33f62bb
+Create Date: 2026-10-18 11:14:36.907152
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6d21c770f51'
+down_revision = '7c62b33f62bb'
+branch_labels = None
+depends_on = None
+
+STATS = ['games_played', 'minutes_played', 'field_goal_percentage', 'free_throw_percentage', 'total_rebounds',
+         'assists', 'steals', 'blocks', 'turnovers', 'points']
+
+
+def upgrade() -> None:
+    # the materialized view had to be refreshed, rescanning athlete_stats, on every insert;
+    # the table is kept up to date incrementally by the endpoints instead (see src/rollups.py)
+    op.execute('DROP MATERIALIZED VIEW max_athlete_stats')
+
+    op.create_table(
+        'max_athlete_stats',
+        *[sa.Column(f'max_{stat}', sa.Float if stat.endswith('percentage') else sa.Integer) for stat in STATS]
+    )
+    # a unique index on a constant allows a single row
+    op.execute('CREATE UNIQUE INDEX max_athlete_stats_one_row ON max_athlete_stats ((true))')
+
+    op.execute(f'''
+    INSERT INTO max_athlete_stats
+    SELECT {", ".join(f"MAX({stat})" for stat in STATS)}
+    FROM athlete_stats;
+    ''')
+
+
+def downgrade() -> None:
+    op.drop_table('max_athlete_stats')
+
+    op.execute(f'''
+    CREATE MATERIALIZED VIEW max_athlete_stats AS
+    SELECT {", ".join(f"MAX({stat}) AS max_{stat}" for stat in STATS)}
+    FROM athlete_stats;
+    ''')
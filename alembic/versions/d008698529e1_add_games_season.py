@@ -0,0 +1,32 @@
+"""add games.season
+
+Revision ID: d008698529e1
+Revises: ef21c1d653e5
+Create Date: 2026-10-18 10:41:37.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd008698529e1'
+down_revision = 'ef21c1d653e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # stored generated column, so adding it backfills every existing game
+    op.add_column(
+        'games',
+        sa.Column('season', sa.Integer, sa.Computed(
+            "CASE WHEN EXTRACT(MONTH FROM date) >= 10 THEN EXTRACT(YEAR FROM date)::int + 1 "
+            "ELSE EXTRACT(YEAR FROM date)::int END", persisted=True), nullable=False)
+    )
+    op.create_index('ix_games_season', 'games', ['season'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_games_season', table_name='games')
+    op.drop_column('games', 'season')
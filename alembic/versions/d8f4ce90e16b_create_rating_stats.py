@@ -0,0 +1,53 @@
+"""create rating stats
+
+Revision ID: d8f4ce90e16b
+Revises: 52a94b7b4943
+Create Date: 2026-10-18 18:52:07.114930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f4ce90e16b'
+down_revision = '52a94b7b4943'
+branch_labels = None
+depends_on = None
+
+LEVELS = range(1, 6)
+
+
+def create_rating_stats(table, id_column, references):
+    op.create_table(
+        table,
+        sa.Column(id_column, sa.Integer, primary_key=True),
+        sa.ForeignKeyConstraint([id_column], [references]),
+        sa.Column('rating_sum', sa.Integer, nullable=False),
+        sa.Column('rating_count', sa.Integer, nullable=False),
+        *[sa.Column(f'rating_{level}', sa.Integer, nullable=False) for level in LEVELS]
+    )
+
+
+def backfill(table, ratings, id_column):
+    op.execute(f'''
+    INSERT INTO {table}
+    SELECT {id_column}, SUM(rating), COUNT(*),
+           {", ".join(f"COUNT(*) FILTER (WHERE rating = {level})" for level in LEVELS)}
+    FROM {ratings}
+    GROUP BY {id_column};
+    ''')
+
+
+def upgrade() -> None:
+    # per-team and per-athlete rating totals, kept up to date by the rating endpoints
+    # (see src/rollups.py) so a prediction reads one row instead of every rating
+    create_rating_stats('team_rating_stats', 'team_id', 'teams.team_id')
+    create_rating_stats('athlete_rating_stats', 'athlete_id', 'athletes.athlete_id')
+    backfill('team_rating_stats', 'team_ratings', 'team_id')
+    backfill('athlete_rating_stats', 'athlete_ratings', 'athlete_id')
+
+
+def downgrade() -> None:
+    op.drop_table('athlete_rating_stats')
+    op.drop_table('team_rating_stats')
@@ -0,0 +1,43 @@
+"""add indexes for the API's query predicates
+
+Revision ID: e9ba75e21890
+Revises: d008698529e1
+Create Date: 2026-10-18 11:02:54.661307
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9ba75e21890'
+down_revision = 'd008698529e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        # get_game: home = ? AND away = ? ORDER BY date
+        op.create_index('ix_games_home_away_date', 'games', ['home', 'away', 'date'],
+                        postgresql_concurrently=True)
+        # year-wide athlete_stats scans (compare_athletes, leaderboards)
+        op.create_index('ix_athlete_stats_year', 'athlete_stats', ['year'],
+                        postgresql_concurrently=True)
+        # market prices read every rating of one entity; INCLUDE makes those index-only scans
+        op.create_index('ix_athlete_ratings_athlete_id', 'athlete_ratings', ['athlete_id'],
+                        postgresql_include=['rating'], postgresql_concurrently=True)
+        op.create_index('ix_team_ratings_team_id', 'team_ratings', ['team_id'],
+                        postgresql_include=['rating'], postgresql_concurrently=True)
+        # add_athlete: name = ?
+        op.create_index('ix_athletes_name', 'athletes', ['name'],
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_athletes_name', table_name='athletes', postgresql_concurrently=True)
+        op.drop_index('ix_team_ratings_team_id', table_name='team_ratings', postgresql_concurrently=True)
+        op.drop_index('ix_athlete_ratings_athlete_id', table_name='athlete_ratings', postgresql_concurrently=True)
+        op.drop_index('ix_athlete_stats_year', table_name='athlete_stats', postgresql_concurrently=True)
+        op.drop_index('ix_games_home_away_date', table_name='games', postgresql_concurrently=True)
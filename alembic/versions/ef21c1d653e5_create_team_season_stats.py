@@ -0,0 +1,58 @@
+"""create team_season_stats
+
+Revision ID: ef21c1d653e5
+Revises: 4c15ee86918d
+Create Date: 2026-10-18 10:05:12.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ef21c1d653e5'
+down_revision = '4c15ee86918d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'team_season_stats',
+        sa.Column('team_id', sa.Integer, primary_key=True),
+        sa.ForeignKeyConstraint(['team_id'], ['teams.team_id']),
+        sa.Column('season', sa.Integer, primary_key=True),
+        sa.Column('wins', sa.Integer, nullable=False),
+        sa.Column('losses', sa.Integer, nullable=False),
+        sa.Column('points_for', sa.Integer, nullable=False),
+        sa.Column('points_allowed', sa.Integer, nullable=False),
+        sa.Column('rebounds', sa.Integer, nullable=False),
+        sa.Column('assists', sa.Integer, nullable=False),
+        sa.Column('steals', sa.Integer, nullable=False),
+        sa.Column('blocks', sa.Integer, nullable=False)
+    )
+
+    # backfill from every game, seen once from each team's side (ties go to the away team)
+    op.execute('''
+    INSERT INTO team_season_stats
+    SELECT team_id, season,
+           COUNT(*) FILTER (WHERE won), COUNT(*) FILTER (WHERE NOT won),
+           SUM(points_for), SUM(points_allowed), SUM(rebounds), SUM(assists), SUM(steals), SUM(blocks)
+    FROM (
+        SELECT home AS team_id, date, pts_home > pts_away AS won, pts_home AS points_for, pts_away AS points_allowed,
+               reb_home AS rebounds, ast_home AS assists, stl_home AS steals, blk_home AS blocks
+        FROM games
+        UNION ALL
+        SELECT away, date, pts_home <= pts_away, pts_away, pts_home, reb_away, ast_away, stl_away, blk_away
+        FROM games
+    ) AS team_games,
+    LATERAL (
+        SELECT CASE WHEN EXTRACT(MONTH FROM date) >= 10 THEN EXTRACT(YEAR FROM date) + 1
+                    ELSE EXTRACT(YEAR FROM date) END::int AS season
+    ) AS seasons
+    GROUP BY team_id, season;
+    ''')
+
+
+def downgrade() -> None:
+    op.drop_table('team_season_stats')
@@ -0,0 +1,67 @@
+"""
+Times POST /athletes/season against the previous version, which refreshed the max_athlete_stats
+materialized view, i.e. rescanned all of athlete_stats, in every insert. The refresh is reproduced
+by running its aggregate in the same transaction. Intended for the fake dataset from
+src/populate_fake_data.py; the athletes it adds are removed afterwards:
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.add_season --inserts 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import sqlalchemy
+
+from src import database as db
+from src import rollups
+from src.api import athletes
+
+STATS = athletes.AthleteStats(games_played=1, minutes_played=1, field_goal_percentage=0.5,
+                              free_throw_percentage=0.5, total_rebounds=1, assists=1, steals=1, blocks=1,
+                              turnovers=1, points=1)
+
+
+async def legacy_add_athlete_season(athlete):
+    async with db.writer() as conn:
+        await conn.execute(db.athlete_stats.insert().values(
+            athlete_id=athlete.athlete_id, year=athlete.year, age=athlete.age, team_id=athlete.team_id,
+            **athlete.stats.dict()))
+        await conn.execute(sqlalchemy.select(rollups.athlete_stats_maxima()))
+
+
+async def time_inserts(name, add_season, athlete_ids):
+    timings = []
+    for athlete_id in athlete_ids:
+        season = athletes.AthleteJson(athlete_id=athlete_id, age=30, year=2023, team_id=0, stats=STATS)
+        start = time.perf_counter()
+        await add_season(season)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{name:>20}: median {statistics.median(timings) * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms")
+
+
+async def main(inserts):
+    async with db.reader() as conn:
+        count = (await conn.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(db.athlete_stats))
+                 ).scalar_one()
+    print(f"{count} athlete_stats rows")
+
+    athlete_ids = [await athletes.add_athlete(f"Benchmark Athlete {i}") for i in range(2 * inserts)]
+    try:
+        await time_inserts("refresh (legacy)", legacy_add_athlete_season, athlete_ids[:inserts])
+        await time_inserts("add_athlete_season", athletes.add_athlete_season, athlete_ids[inserts:])
+    finally:
+        async with db.writer() as conn:
+            await conn.execute(db.athlete_stats.delete().where(db.athlete_stats.c.athlete_id.in_(athlete_ids)))
+            await conn.execute(db.athletes.delete().where(db.athletes.c.athlete_id.in_(athlete_ids)))
+            await conn.run_sync(rollups.rebuild_max_athlete_stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--inserts", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.inserts))
@@ -0,0 +1,83 @@
+"""
+Times POST /games/bulk loading many games in one request, against adding them one request at a
+time through POST /games/add_game (timed on a sample and extrapolated). Intended for the fake
+dataset from src/populate_fake_data.py; the games are dated from 2200 on and removed afterwards,
+along with their team_season_stats:
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.bulk_games --games 100000
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import time
+
+import httpx
+import sqlalchemy
+
+from src import database as db
+from src.api import games
+from src.api.server import app
+
+FIRST_DATE = datetime.date(2200, 1, 1)
+
+
+def random_games(count, team_ids):
+    uploaded = []
+    for i in range(count):
+        home, away = random.sample(team_ids, 2)
+        points_home = random.randint(80, 130)
+        uploaded.append({
+            "home_team_id": home, "away_team_id": away,
+            "date": (FIRST_DATE + datetime.timedelta(days=i % 3650)).isoformat(),
+            "points_home": points_home, "points_away": points_home + random.choice([-1, 1]) * random.randint(1, 30),
+            **{f"{stat}_{side}": random.randint(0, 60)
+               for stat in ("rebounds", "assists", "steals", "blocks") for side in ("home", "away")}
+        })
+    return uploaded
+
+
+async def delete_games():
+    async with db.writer() as conn:
+        await conn.execute(db.games.delete().where(db.games.c.date >= FIRST_DATE))
+        await conn.execute(db.team_season_stats.delete().where(db.team_season_stats.c.season > FIRST_DATE.year))
+
+
+async def time_bulk(client, name, content, content_type, count):
+    start = time.perf_counter()
+    response = await client.post("/games/bulk", content=content, headers={"content-type": content_type})
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200 and response.json()["error_count"] == 0, response.text[:500]
+    print(f"{name:>20}: {elapsed:.2f} s, {count / elapsed:,.0f} games/s")
+    await delete_games()
+
+
+async def main(count, sample):
+    async with db.reader() as conn:
+        team_ids = (await conn.execute(sqlalchemy.select(db.teams.c.team_id))).scalars().all()
+    uploaded = random_games(count, team_ids)
+
+    try:
+        start = time.perf_counter()
+        for game in uploaded[:sample]:
+            await games.add_game(games.GameJson(**game))
+        per_game = (time.perf_counter() - start) / sample
+        print(f"{'add_game':>20}: {per_game * 1000:.2f} ms per game, {1 / per_game:,.0f} games/s")
+        await delete_games()
+
+        async with httpx.AsyncClient(app=app, base_url="http://test", timeout=None) as client:
+            await time_bulk(client, "bulk, JSON list", json.dumps(uploaded), "application/json", count)
+            await time_bulk(client, "bulk, NDJSON", "\n".join(map(json.dumps, uploaded)), "application/x-ndjson",
+                            count)
+    finally:
+        await delete_games()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--sample", type=int, default=500, help="games added one at a time for comparison")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.games, args.sample))
@@ -0,0 +1,90 @@
+"""
+Times POST /athletes/season/bulk loading a large CSV of new seasons, against adding the same
+seasons one request at a time through POST /athletes/season (timed on a sample and extrapolated).
+Intended for the fake dataset from src/populate_fake_data.py; the athletes it adds are removed afterwards:
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.bulk_seasons --rows 500000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+import sqlalchemy
+
+from src import database as db
+from src import rollups
+from src.api import athletes
+from src.api.server import app
+
+YEARS = range(2019, 2024)
+BENCHMARK_ATHLETES = sqlalchemy.select(db.athletes.c.athlete_id).where(
+    db.athletes.c.name.startswith("Bulk Benchmark Athlete "))
+
+
+def season_csv(athlete_ids, team_ids):
+    columns = ["athlete_id", "year", "age", "team_id", *athletes.AthleteStats.__fields__]
+    lines = [",".join(columns)]
+    for athlete_id in athlete_ids:
+        for year in YEARS:
+            lines.append(",".join(map(str, [
+                athlete_id, year, random.randint(19, 40), random.choice(team_ids),
+                random.randint(0, 82), random.randint(0, 3000), round(random.random(), 3), round(random.random(), 3),
+                random.randint(0, 800), random.randint(0, 600), random.randint(0, 150), random.randint(0, 150),
+                random.randint(0, 300), random.randint(0, 2500)])))
+    return "\n".join(lines) + "\n"
+
+
+async def time_single_inserts(body, sample):
+    rows = body.splitlines()[1:sample + 1]
+    start = time.perf_counter()
+    for row in rows:
+        values = row.split(",")
+        await athletes.add_athlete_season(athletes.AthleteJson(
+            athlete_id=values[0], year=values[1], age=values[2], team_id=values[3],
+            stats=dict(zip(athletes.AthleteStats.__fields__, values[4:]))))
+    return (time.perf_counter() - start) / len(rows)
+
+
+async def delete_seasons(conn):
+    await conn.execute(db.athlete_stats.delete().where(db.athlete_stats.c.athlete_id.in_(BENCHMARK_ATHLETES)))
+
+
+async def main(rows, sample):
+    async with db.writer() as conn:
+        team_ids = (await conn.execute(sqlalchemy.select(db.teams.c.team_id))).scalars().all()
+        names = sqlalchemy.select(sqlalchemy.literal("Bulk Benchmark Athlete ") + sqlalchemy.cast(
+            sqlalchemy.func.generate_series(1, rows // len(YEARS)), sqlalchemy.String))
+        athlete_ids = (await conn.execute(
+            db.athletes.insert().from_select(["name"], names).returning(db.athletes.c.athlete_id))).scalars().all()
+    body = season_csv(athlete_ids, team_ids)
+    print(f"{len(athlete_ids) * len(YEARS)} rows, {len(body) / 2 ** 20:.1f} MiB of CSV")
+
+    try:
+        per_row = await time_single_inserts(body, sample)
+        print(f"{'add_athlete_season':>20}: {per_row * 1000:.2f} ms per row, "
+              f"~{per_row * len(athlete_ids) * len(YEARS):.0f} s for every row")
+        async with db.writer() as conn:
+            await delete_seasons(conn)
+
+        async with httpx.AsyncClient(app=app, base_url="http://test", timeout=None) as client:
+            start = time.perf_counter()
+            response = await client.post("/athletes/season/bulk", content=body, headers={"content-type": "text/csv"})
+            elapsed = time.perf_counter() - start
+        print(f"{'bulk':>20}: {elapsed:.2f} s, {response.json()['inserted']} inserted, "
+              f"{response.json()['error_count']} errors")
+    finally:
+        async with db.writer() as conn:
+            await delete_seasons(conn)
+            await conn.execute(db.athletes.delete().where(db.athletes.c.athlete_id.in_(BENCHMARK_ATHLETES)))
+            await conn.run_sync(rollups.rebuild_max_athlete_stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--sample", type=int, default=500, help="rows added one at a time for comparison")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rows, args.sample))
@@ -0,0 +1,53 @@
+"""
+Measures import-to-first-response time of the API, the cost a serverless cold start pays.
+
+Each sample runs in a fresh interpreter. `--reflect` adds the eight table reflections
+the app used to do at import time, for comparison.
+
+    python -m benchmarks.cold_start --runs 10 [--reflect]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+SAMPLE = """
+import time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+from src.api.server import app
+from src import database as db
+if {reflect}:
+    import sqlalchemy
+    sqlalchemy.MetaData().reflect(db.get_engine(), only=[t.name for t in db.metadata_obj.sorted_tables], views=True)
+imported = time.perf_counter()
+response = TestClient(app).get("/teams/{team_id}")
+assert response.status_code == 200, response.text
+done = time.perf_counter()
+print(imported - start, done - start)
+"""
+
+
+def run(runs, reflect, team_id):
+    imports, totals = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SAMPLE.format(reflect=reflect, team_id=team_id)],
+            check=True, capture_output=True, text=True
+        ).stdout.split()
+        imports.append(float(output[0]))
+        totals.append(float(output[1]))
+    return imports, totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--reflect", action="store_true")
+    parser.add_argument("--team-id", type=int, default=1)
+    args = parser.parse_args()
+
+    imports, totals = run(args.runs, args.reflect, args.team_id)
+    print(f"import:         median {statistics.median(imports) * 1000:.1f} ms")
+    print(f"first response: median {statistics.median(totals) * 1000:.1f} ms "
+          f"(min {min(totals) * 1000:.1f}, max {max(totals) * 1000:.1f})")
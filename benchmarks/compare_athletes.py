@@ -0,0 +1,75 @@
+"""
+Times GET /athletes/compare_athletes/ against the two-query version it replaced,
+for lists of 10, 100 and 1000 athlete ids. Intended for the fake dataset from
+src/populate_fake_data.py:
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.compare_athletes --rounds 50
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import sqlalchemy
+
+from src import database as db
+from src.api import athletes
+
+SIZES = [10, 100, 1000]
+
+
+async def legacy_compare_athletes(year, athlete_ids, stat):
+    # the previous implementation: athletes with stats, an O(n^2) scan for the rest, then a second query
+    athlete_stats = sqlalchemy.select(db.athlete_stats, db.athletes).select_from(
+        db.athletes.join(db.athlete_stats, isouter=True)
+    ).where(
+        (db.athletes.c.athlete_id.in_(athlete_ids) & (db.athlete_stats.c.year == year))
+    ).order_by(sqlalchemy.desc(sqlalchemy.column(stat)))
+    async with db.reader() as conn:
+        result = (await conn.execute(athlete_stats)).fetchall()
+        json = [{"athlete_id": row.athlete_id, "name": row.name, stat.value: getattr(row, stat)} for row in result]
+        included_ids = [athlete.get("athlete_id") for athlete in json]
+        excluded_ids = [x for x in athlete_ids if x not in included_ids]
+        excluded = sqlalchemy.select(db.athletes.c.athlete_id, db.athletes.c.name).where(
+            sqlalchemy.column('athlete_id').in_(excluded_ids))
+        for row in (await conn.execute(excluded)).fetchall():
+            json.append({"athlete_id": row.athlete_id, "name": row.name, stat.value: None})
+    return json
+
+
+async def time_calls(name, run, size, rounds, max_id):
+    timings = []
+    for _ in range(rounds):
+        ids = random.sample(range(max_id + 1), size)
+        start = time.perf_counter()
+        await run(ids)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{name:>20} {size:>5} ids: median {statistics.median(timings) * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms")
+
+
+async def main(rounds):
+    async with db.reader() as conn:
+        max_id = (await conn.execute(sqlalchemy.select(sqlalchemy.func.max(db.athletes.c.athlete_id)))).scalar_one()
+
+    for size in SIZES:
+        await time_calls("legacy", lambda ids: legacy_compare_athletes(2023, ids, athletes.StatOptions.points),
+                         size, rounds, max_id)
+        await time_calls("compare_athletes", lambda ids: athletes.compare_athletes(
+            year=2023, athlete_ids=ids, stat=athletes.StatOptions.points, stats=None, order_by=None),
+                         size, rounds, max_id)
+        await time_calls("compare_athletes x3", lambda ids: athletes.compare_athletes(
+            year=2023, athlete_ids=ids, stat=athletes.StatOptions.points,
+            stats=[athletes.StatOptions.points, athletes.StatOptions.assists, athletes.StatOptions.blocks],
+            order_by=athletes.StatOptions.assists),
+                         size, rounds, max_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rounds))
@@ -0,0 +1,83 @@
+"""
+Runs many parallel writers of POST /games/add_game, with the previous max(id) + 1 insert in a
+SERIALIZABLE transaction and with the current sequence-backed READ COMMITTED one, and reports
+inserts/sec and aborted transactions. The games are written to season 2031 and removed afterwards:
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.concurrent_writes --writers 50 --games 20
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import time
+
+import sqlalchemy
+from sqlalchemy.exc import DBAPIError
+
+from src import database as db
+from src import rollups
+from src.api import games
+
+GAME = games.GameJson(home_team_id=1, away_team_id=2, date=datetime.date(2031, 1, 1), points_home=100,
+                      points_away=90, rebounds_home=40, rebounds_away=40, assists_home=20, assists_away=20,
+                      steals_home=5, steals_away=5, blocks_home=5, blocks_away=5)
+
+
+async def legacy_add_game(game):
+    # the previous implementation: next id from max(game_id), in a SERIALIZABLE transaction
+    async with db.writer() as conn:
+        game_id = (await conn.execute(
+            sqlalchemy.select(db.games.c.game_id).order_by(sqlalchemy.desc(db.games.c.game_id)).limit(1)
+        )).scalar_one() + 1
+        await conn.execute(db.games.insert().values(
+            game_id=game_id, home=game.home_team_id, away=game.away_team_id, date=game.date,
+            pts_home=game.points_home, pts_away=game.points_away, reb_home=game.rebounds_home,
+            reb_away=game.rebounds_away, ast_home=game.assists_home, ast_away=game.assists_away,
+            stl_home=game.steals_home, stl_away=game.steals_away, blk_home=game.blocks_home,
+            blk_away=game.blocks_away))
+        await rollups.update_team_season_stats(conn, [game_id])
+    return game_id
+
+
+async def writer(add_game, count, results):
+    for _ in range(count):
+        try:
+            await add_game(GAME)
+            results["inserted"] += 1
+        except DBAPIError:
+            results["aborted"] += 1
+
+
+async def run(name, add_game, writers, count):
+    results = {"inserted": 0, "aborted": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(add_game, count, results) for _ in range(writers)))
+    seconds = time.perf_counter() - start
+    print(f"{name:>8}: {results['inserted'] / seconds:8.1f} inserts/s, "
+          f"{results['inserted']} inserted, {results['aborted']} aborted")
+
+
+async def cleanup():
+    async with db.writer() as conn:
+        await conn.execute(db.games.delete().where(db.games.c.season == 2031))
+        await conn.execute(db.team_season_stats.delete().where(db.team_season_stats.c.season == 2031))
+
+
+async def main(writers, count):
+    print(f"{writers} writers x {count} games")
+    try:
+        await run("legacy", legacy_add_game, writers, count)
+        await cleanup()
+        await run("add_game", games.add_game, writers, count)
+    finally:
+        await cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=50)
+    parser.add_argument("--games", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_POOL_SIZE", str(args.writers))
+    asyncio.run(main(args.writers, args.games))
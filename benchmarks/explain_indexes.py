@@ -0,0 +1,114 @@
+"""
+Runs every read endpoint's SQL through EXPLAIN (ANALYZE, BUFFERS), with and without
+the indexes added for them by the migrations, and prints the timings side by side.
+
+The statements are captured from the handlers themselves, so they stay in sync with the code.
+The "before" numbers come from dropping the indexes inside a transaction that is rolled back,
+so the database is left untouched. Intended for the fake dataset from src/populate_fake_data.py:
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.explain_indexes
+"""
+import asyncio
+import datetime
+import json
+
+import asyncpg
+import sqlalchemy
+from fastapi import HTTPException
+
+from src import database as db
+from src.api import athletes, games, predictions, teams
+
+INDEXES = ["ix_games_home_away_date", "ix_athlete_stats_year", "ix_athlete_ratings_athlete_id",
+           "ix_team_ratings_team_id", "ix_athletes_name",
+           *[f"ix_athlete_stats_year_{stat.value}" for stat in athletes.StatOptions],
+           "ix_games_date_brin", "ix_games_home_date", "ix_games_away_date"]
+
+ENDPOINTS = {
+    "get_athlete": lambda: athletes.get_athlete(id=321),
+    "compare_athletes": lambda: athletes.compare_athletes(year=2023, athlete_ids=list(range(0, 50)),
+                                                          stat=athletes.StatOptions.points, stats=None, order_by=None),
+    "athlete_leaders": lambda: athletes.get_leaders(year=2023, stat=athletes.StatOptions.points, k=50),
+    "list_athletes": lambda: athletes.list_athletes(name="james", limit=250, offset=0,
+                                                    pagination=athletes.PaginationModes.offset, cursor=None),
+    "get_team": lambda: teams.get_team(team_id=1),
+    "compare_teams": lambda: teams.compare_team(team_ids=list(range(30)), compare_by=list(teams.stat_options),
+                                                since_season=None, until_season=None),
+    "list_team": lambda: teams.list_team(name="los", limit=30, offset=0,
+                                             pagination=teams.PaginationModes.offset, cursor=None),
+    "get_game": lambda: games.get_game(home_team_id=1, away_team_id=2, winner=None, since=None, until=None,
+                                       both_directions=False, limit=None, cursor=None),
+    "search_games": lambda: games.search_games(since=datetime.date(2020, 1, 1), until=datetime.date(2020, 1, 31),
+                                               team_id=None, limit=100, cursor=None),
+    "search_games_team": lambda: games.search_games(since=None, until=None, team_id=1, limit=100, cursor=None),
+    "team_market_price": lambda: predictions.get_team_market_price(team_id=1),
+    "athlete_market_price": lambda: predictions.get_athlete_market_price(id=5),
+}
+
+
+async def capture_statements(endpoints=ENDPOINTS):
+    """Calls every endpoint once and records the SELECTs it sends, with their parameters."""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    sync_engine = db.get_async_engine().sync_engine
+    sqlalchemy.event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    statements = {}
+    try:
+        for name, call in endpoints.items():
+            captured.clear()
+            try:
+                await call()
+            except HTTPException:
+                pass
+            statements[name] = list(captured)
+    finally:
+        sqlalchemy.event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+async def explain(conn, statement, parameters):
+    plan = await conn.fetchval("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, *(parameters or ()))
+    plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]
+    return plan["Execution Time"], plan["Plan"].get("Shared Hit Blocks", 0) + plan["Plan"].get("Shared Read Blocks", 0)
+
+
+async def explain_all(conn, statements):
+    totals = {}
+    for name, queries in statements.items():
+        time_ms = buffers = 0
+        for statement, parameters in queries:
+            query_time, query_buffers = await explain(conn, statement, parameters)
+            time_ms += query_time
+            buffers += query_buffers
+        totals[name] = (time_ms, buffers)
+    return totals
+
+
+async def main():
+    statements = await capture_statements()
+
+    conn = await asyncpg.connect(db.database_connection_url())
+    try:
+        transaction = conn.transaction()
+        await transaction.start()
+        await explain_all(conn, statements)  # warm the cache so both runs start equal
+        after = await explain_all(conn, statements)
+        for index in INDEXES:
+            await conn.execute(f"DROP INDEX IF EXISTS {index}")
+        before = await explain_all(conn, statements)
+        await transaction.rollback()
+    finally:
+        await conn.close()
+
+    print(f"{'endpoint':<22}{'queries':>8}{'before ms':>12}{'after ms':>12}{'before buf':>12}{'after buf':>12}")
+    for name in statements:
+        print(f"{name:<22}{len(statements[name]):>8}{before[name][0]:>12.2f}{after[name][0]:>12.2f}"
+              f"{before[name][1]:>12}{after[name][1]:>12}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
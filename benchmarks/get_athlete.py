@@ -0,0 +1,63 @@
+"""
+Times GET /athletes/{id} against the two-join lookup it replaced.
+Intended for the fake dataset from src/populate_fake_data.py (100k athletes x 5 seasons):
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.get_athlete --lookups 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import sqlalchemy
+
+from src import database as db
+from src.api import athletes
+
+
+async def legacy_get_athlete(id, year=None):
+    # the previous implementation: the full join once to check the athlete exists, then again for the stats
+    athlete = sqlalchemy.select(db.athlete_stats, db.athletes, db.teams).select_from(
+        db.athletes.join(db.athlete_stats, isouter=True).join(db.teams, isouter=True)
+    ).where(db.athletes.c.athlete_id == id)
+    async with db.reader() as conn:
+        (await conn.execute(athlete)).fetchone()
+        if year:
+            athlete = athlete.where(db.athlete_stats.c.year == year)
+        (await conn.execute(athlete)).fetchall()
+
+
+async def time_lookups(name, run, ids, year):
+    timings = []
+    for athlete_id in ids:
+        start = time.perf_counter()
+        await run(id=athlete_id, year=year)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{name:>12} (year={year}): median {statistics.median(timings) * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} ms")
+
+
+async def main(lookups):
+    async with db.reader() as conn:
+        athlete_count, season_count = (await conn.execute(sqlalchemy.select(
+            sqlalchemy.select(sqlalchemy.func.count()).select_from(db.athletes).scalar_subquery(),
+            sqlalchemy.select(sqlalchemy.func.count()).select_from(db.athlete_stats).scalar_subquery()
+        ))).one()
+        max_id = (await conn.execute(sqlalchemy.select(sqlalchemy.func.max(db.athletes.c.athlete_id)))).scalar_one()
+    print(f"{athlete_count} athletes, {season_count} seasons")
+
+    ids = [random.randint(0, max_id) for _ in range(lookups)]
+    for year in (None, 2022):
+        await time_lookups("legacy", legacy_get_athlete, ids, year)
+        await time_lookups("get_athlete", athletes.get_athlete, ids, year)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.lookups))
@@ -0,0 +1,98 @@
+"""
+Times GET /games/ for one matchup with many games, against the previous implementation,
+which fetched every game of the matchup, then both team names, and filtered `winner` in Python.
+Intended for the fake dataset from src/populate_fake_data.py; the matchup is padded with
+--games extra games (dated from 2200 on), which are removed afterwards:
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.get_game --games 5000
+"""
+import argparse
+import asyncio
+import datetime
+import statistics
+import time
+
+import sqlalchemy
+
+from src import database as db
+from src.api import games
+
+HOME, AWAY = 1, 2
+PADDING_FROM = datetime.date(2200, 1, 1)
+
+
+async def legacy_get_game(home_team_id, away_team_id, winner=None):
+    async with db.reader() as conn:
+        result = (await conn.execute(
+            sqlalchemy.select(db.games.c.game_id, db.games.c.home, db.games.c.away, db.games.c.pts_home,
+                              db.games.c.pts_away, db.games.c.date)
+            .where((db.games.c.home == home_team_id) & (db.games.c.away == away_team_id))
+            .order_by(db.games.c.date)
+        )).fetchall()
+        home_team = (await conn.execute(
+            sqlalchemy.select(db.teams.c.team_name).where(db.teams.c.team_id == home_team_id))).scalar_one()
+        away_team = (await conn.execute(
+            sqlalchemy.select(db.teams.c.team_name).where(db.teams.c.team_id == away_team_id))).scalar_one()
+    json = [{"game_id": game.game_id, "home_team": home_team, "away_team": away_team,
+             "winner": home_team if game.pts_home > game.pts_away else away_team,
+             "home_team_score": game.pts_home, "away_team_score": game.pts_away, "date": str(game.date)}
+            for game in result]
+    if winner == games.winner_options.home:
+        json = [game for game in json if game["winner"] == home_team]
+    return json
+
+
+async def time_calls(name, call, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{name:>32}: median {statistics.median(timings) * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms")
+
+
+def get_game(**options):
+    arguments = dict(home_team_id=HOME, away_team_id=AWAY, winner=None, since=None, until=None,
+                     both_directions=False, limit=None, cursor=None)
+    return lambda: games.get_game(**{**arguments, **options})
+
+
+async def main(padding, calls):
+    async with db.writer() as conn:
+        await conn.execute(db.games.insert().from_select(
+            ["home", "away", "date", "pts_home", "pts_away", "reb_home", "reb_away", "ast_home", "ast_away",
+             "stl_home", "stl_away", "blk_home", "blk_away"],
+            sqlalchemy.select(
+                sqlalchemy.literal(HOME), sqlalchemy.literal(AWAY),
+                sqlalchemy.literal(PADDING_FROM) + sqlalchemy.func.generate_series(1, padding),
+                (80 + sqlalchemy.func.random() * 40).cast(sqlalchemy.Integer),
+                100, *[10] * 8)))
+        count = (await conn.execute(sqlalchemy.select(sqlalchemy.func.count()).where(
+            db.games.c.home == HOME, db.games.c.away == AWAY))).scalar_one()
+    print(f"{count} games between teams {HOME} and {AWAY}")
+
+    try:
+        await time_calls("legacy, all games", lambda: legacy_get_game(HOME, AWAY), calls)
+        await time_calls("get_game, all games", get_game(), calls)
+        await time_calls("legacy, winner=home", lambda: legacy_get_game(HOME, AWAY, games.winner_options.home), calls)
+        await time_calls("get_game, winner=home", get_game(winner=games.winner_options.home), calls)
+        await time_calls("get_game, first page of 50", get_game(limit=50), calls)
+        last_year = await games.get_game(home_team_id=HOME, away_team_id=AWAY, winner=None, since=None,
+                                         until=None, both_directions=False, limit=1000, cursor=None)
+        await time_calls("get_game, page of 50 after 1000", get_game(limit=50, cursor=last_year["next_cursor"]),
+                         calls)
+        await time_calls("get_game, both directions, 50", get_game(limit=50, both_directions=True), calls)
+    finally:
+        async with db.writer() as conn:
+            await conn.execute(db.games.delete().where(db.games.c.date >= PADDING_FROM))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.games, args.calls))
@@ -0,0 +1,94 @@
+"""
+Times the rating lookups behind /predictions/team and /predictions/athlete, reading the
+maintained totals row against fetching and averaging every rating as before, and the cost
+the totals add to POST /teamratings/. Intended for the fake dataset from src/populate_fake_data.py
+(150k team ratings over 30 teams):
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.market_price --rounds 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import sqlalchemy
+
+from src import database as db
+from src import rollups
+from src.api import predictions, prediction_utils
+
+
+async def legacy_mean_rating(ratings, id_column, id):
+    # the previous implementation: every rating of the entity, averaged in Python
+    async with db.reader() as conn:
+        rows = (await conn.execute(sqlalchemy.select(ratings.c.rating).where(ratings.c[id_column] == id))).fetchall()
+    ratings = [row.rating for row in rows]
+    return sum(ratings) / len(ratings) if ratings else 3
+
+
+async def mean_rating(stats, id_column, id):
+    stmt = sqlalchemy.select(stats.c.rating_sum, stats.c.rating_count).where(stats.c[id_column] == id)
+    async with db.reader() as conn:
+        return prediction_utils.mean_rating_of((await conn.execute(stmt)).fetchone())
+
+
+async def timed(name, run, ids, rounds):
+    timings = []
+    for _ in range(rounds):
+        for id in ids:
+            start = time.perf_counter()
+            await run(id)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{name:>28}: median {statistics.median(timings) * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms")
+
+
+async def insert_rating(team_id, with_totals):
+    async with db.writer(isolation_level="READ COMMITTED") as conn:
+        await conn.execute(db.team_ratings.insert().values(team_id=team_id, rating=4))
+        if with_totals:
+            await rollups.update_team_rating_stats(conn, team_id, 4)
+
+
+async def main(rounds):
+    async with db.reader() as conn:
+        count = (await conn.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(db.team_ratings))).scalar()
+        athlete_ids = (await conn.execute(sqlalchemy.select(db.athlete_rating_stats.c.athlete_id)
+                                          .order_by(db.athlete_rating_stats.c.rating_count.desc())
+                                          .limit(30))).scalars().all()
+        last_rating_id = (await conn.execute(
+            sqlalchemy.select(sqlalchemy.func.max(db.team_ratings.c.team_rating_id)))).scalar()
+    print(f"{count} team ratings")
+    team_ids = range(30)
+
+    for id in team_ids:
+        assert await mean_rating(db.team_rating_stats, "team_id", id) == \
+            await legacy_mean_rating(db.team_ratings, "team_id", id)
+
+    await timed("team ratings, legacy", lambda id: legacy_mean_rating(db.team_ratings, "team_id", id),
+                team_ids, rounds)
+    await timed("team ratings, totals row", lambda id: mean_rating(db.team_rating_stats, "team_id", id),
+                team_ids, rounds)
+    await timed("athlete ratings, legacy", lambda id: legacy_mean_rating(db.athlete_ratings, "athlete_id", id),
+                athlete_ids, rounds)
+    await timed("athlete ratings, totals row",
+                lambda id: mean_rating(db.athlete_rating_stats, "athlete_id", id), athlete_ids, rounds)
+    await timed("team market price", lambda id: predictions.get_team_market_price(team_id=id), team_ids, rounds)
+
+    try:
+        await timed("add rating, raw row only", lambda id: insert_rating(id, False), team_ids, rounds)
+        await timed("add rating, with totals", lambda id: insert_rating(id, True), team_ids, rounds)
+    finally:
+        async with db.writer() as conn:
+            await conn.execute(db.team_ratings.delete().where(db.team_ratings.c.team_rating_id > last_rating_id))
+        with db.engine.begin() as conn:
+            rollups.rebuild_rating_stats(conn)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rounds))
@@ -0,0 +1,73 @@
+"""
+Reports the memory footprint and lookup latency of the in-process autocomplete index
+(src/api/name_index.py) for 100k and 1M generated names. Needs no database:
+
+    python -m benchmarks.name_index --queries 10000
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+
+from faker import Faker
+
+from src import database as db
+from src.api.name_index import NameIndex
+
+SIZES = [100000, 1000000]
+
+
+def generate_names(count):
+    fake = Faker()
+    first_names = [fake.first_name() for _ in range(2000)]
+    last_names = [fake.last_name() for _ in range(2000)]
+    return [(i, f"{random.choice(first_names)} {random.choice(last_names)}") for i in range(count)]
+
+
+def main(queries):
+    for size in SIZES:
+        rows = generate_names(size)
+
+        tracemalloc.start()
+        index = NameIndex(db.athletes, "athlete_id", "name")
+        index.build(rows)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del index
+
+        # timed separately, since tracing slows every allocation down
+        start = time.perf_counter()
+        index = NameIndex(db.athletes, "athlete_id", "name")
+        index.build(rows)
+        build_seconds = time.perf_counter() - start
+
+        prefixes = [name[:random.randint(1, 6)] for _, name in random.sample(rows, queries)]
+        timings = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            index.prefix(prefix, 10)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+
+        add_timings = []
+        for i, (_, name) in enumerate(random.sample(rows, 1000)):
+            start = time.perf_counter()
+            index.add(size + i, name + " Jr")
+            add_timings.append(time.perf_counter() - start)
+        add_timings.sort()
+
+        print(f"{size} names: {memory / 2 ** 20:.1f} MiB ({memory / size:.0f} B/name on top of the name strings), "
+              f"built in {build_seconds:.2f} s")
+        print(f"    top-10 prefix lookup: median {statistics.median(timings) * 1e6:.1f} us, "
+              f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.1f} us")
+        print(f"    add: median {statistics.median(add_timings) * 1e6:.1f} us, "
+              f"max {add_timings[-1] * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=10000)
+    args = parser.parse_args()
+
+    main(args.queries)
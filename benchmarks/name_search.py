@@ -0,0 +1,85 @@
+"""
+Runs the name searches of /athletes/list_athletes/ and /teams/ through EXPLAIN (ANALYZE, BUFFERS),
+with and without the trigram indexes, for the default substring mode and for search=fuzzy.
+
+With --rows the athletes table is first padded with generated names up to that many rows,
+inside the same rolled-back transaction, to see how the searches scale:
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.name_search --rows 1000000
+"""
+import argparse
+import asyncio
+
+import asyncpg
+
+from benchmarks.explain_indexes import capture_statements, explain_all
+from src import database as db
+from src.api import athletes, teams
+from src.api.pagination import PaginationModes
+from src.api.search import SearchModes
+
+INDEXES = ["ix_athletes_name_trgm", "ix_teams_team_name_trgm"]
+
+
+def list_athletes(name, search):
+    return athletes.list_athletes(name=name, limit=250, offset=0, pagination=PaginationModes.offset,
+                                  cursor=None, search=search)
+
+
+def list_team(name, search):
+    return teams.list_team(name=name, limit=30, offset=0, pagination=PaginationModes.offset,
+                           cursor=None, search=search)
+
+
+ENDPOINTS = {
+    "athletes substring": lambda: list_athletes("james", SearchModes.substring),
+    "athletes fuzzy": lambda: list_athletes("Lebron Jmaes", SearchModes.fuzzy),
+    "teams substring": lambda: list_team("celtics", SearchModes.substring),
+    "teams fuzzy": lambda: list_team("Bostn Celtcs", SearchModes.fuzzy),
+}
+
+
+async def pad_athletes(conn, rows):
+    """Adds athletes named after random pairs of existing first and last names, up to `rows` in total."""
+    count, max_id = await conn.fetchrow("SELECT count(*), max(athlete_id) FROM athletes")
+    if rows <= count:
+        return count
+    await conn.execute('''
+        INSERT INTO athletes (athlete_id, name)
+        SELECT $2 + g, split_part(first.name, ' ', 1) || ' ' || split_part(last.name, ' ', 2)
+        FROM generate_series(1, $1) AS g,
+        LATERAL (SELECT name FROM athletes WHERE athlete_id = (g::bigint * 7919) % $2) AS first,
+        LATERAL (SELECT name FROM athletes WHERE athlete_id = (g::bigint * 104729) % $2) AS last
+    ''', rows - count, max_id)
+    await conn.execute("ANALYZE athletes")
+    return rows
+
+
+async def main(rows):
+    statements = await capture_statements(ENDPOINTS)
+
+    conn = await asyncpg.connect(db.database_connection_url())
+    try:
+        transaction = conn.transaction()
+        await transaction.start()
+        print(f"{await pad_athletes(conn, rows)} athletes")
+        await explain_all(conn, statements)  # warm the cache so both runs start equal
+        after = await explain_all(conn, statements)
+        for index in INDEXES:
+            await conn.execute(f"DROP INDEX IF EXISTS {index}")
+        before = await explain_all(conn, statements)
+        await transaction.rollback()
+    finally:
+        await conn.close()
+
+    print(f"{'search':<22}{'before ms':>12}{'after ms':>12}{'before buf':>12}{'after buf':>12}")
+    for name in statements:
+        print(f"{name:<22}{before[name][0]:>12.2f}{after[name][0]:>12.2f}{before[name][1]:>12}{after[name][1]:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=0)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rows))
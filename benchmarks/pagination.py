@@ -0,0 +1,45 @@
+"""
+Times GET /athletes/list_athletes/ pages at increasing depth, in offset and keyset mode.
+Intended for the 100k-athlete dataset from src/populate_fake_data.py:
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.pagination --rounds 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from src.api import athletes
+from src.api.pagination import PaginationModes, encode_cursor
+
+LIMIT = 250
+DEPTHS = [0, 1000, 10000, 50000, 99750]
+
+
+async def time_page(run, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await run()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+async def main(rounds):
+    print(f"{'offset':>8}{'offset ms':>12}{'keyset ms':>12}")
+    for depth in DEPTHS:
+        offset_ms = await time_page(lambda: athletes.list_athletes(
+            name="", limit=LIMIT, offset=depth, pagination=PaginationModes.offset, cursor=None), rounds)
+        # the fake athletes have consecutive ids from 0, so the row before `depth` has id depth - 1
+        cursor = encode_cursor(depth - 1) if depth else None
+        keyset_ms = await time_page(lambda: athletes.list_athletes(
+            name="", limit=LIMIT, offset=0, pagination=PaginationModes.keyset, cursor=cursor), rounds)
+        print(f"{depth:>8}{offset_ms:>12.2f}{keyset_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rounds))
@@ -0,0 +1,79 @@
+"""
+Sustained rating throughput of POST /teamratings/ and /athleteratings/ with and without the
+write-behind buffer (src/api/rating_buffer.py). Concurrent clients call the handlers for a
+fixed time; a rating counts once it is acknowledged, and for the buffered modes also once it
+is written, including the time to drain the queue at the end:
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.rating_buffer --seconds 10 --clients 200
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import sqlalchemy
+
+from src import database as db
+from src import rollups
+from src.api import name_index, rating_buffer, ratings
+
+MODES = ["direct", "flush", "enqueue"]
+
+
+async def client(deadline, team_ids, athlete_ids, acked):
+    while time.perf_counter() < deadline:
+        rating = ratings.Rating(id=random.choice(team_ids), rating=random.randint(1, 5))
+        if random.random() < 0.5:
+            await ratings.add_team_rating(rating)
+        else:
+            rating.id = random.choice(athlete_ids)
+            await ratings.add_athlete_rating(rating)
+        acked[0] += 1
+
+
+async def run(mode, seconds, clients, team_ids, athlete_ids, flush_ms, batch_rows):
+    if mode != "direct":
+        rating_buffer.buffer = rating_buffer.RatingBuffer(
+            ack_after_flush=mode == "flush", flush_interval=flush_ms / 1000, batch_rows=batch_rows)
+        await rating_buffer.buffer.start()
+    acked = [0]
+    start = time.perf_counter()
+    await asyncio.gather(*[client(start + seconds, team_ids, athlete_ids, acked) for _ in range(clients)])
+    acked_seconds = time.perf_counter() - start
+    await rating_buffer.stop()
+    written_seconds = time.perf_counter() - start
+    print(f"{mode:>8}: {acked[0] / acked_seconds:>9.0f} acked/s, {acked[0] / written_seconds:>9.0f} written/s "
+          f"({acked[0]} ratings)")
+
+
+async def main(seconds, clients, flush_ms, batch_rows):
+    await name_index.load_all()
+    async with db.reader() as conn:
+        last_team_rating = (await conn.execute(
+            sqlalchemy.select(sqlalchemy.func.max(db.team_ratings.c.team_rating_id)))).scalar() or 0
+        last_athlete_rating = (await conn.execute(
+            sqlalchemy.select(sqlalchemy.func.max(db.athlete_ratings.c.athlete_rating_id)))).scalar() or 0
+    team_ids = list(name_index.team_names.names)
+    athlete_ids = list(name_index.athlete_names.names)
+    print(f"{clients} clients, {seconds} s per mode, batches of up to {batch_rows} every {flush_ms} ms")
+    try:
+        for mode in MODES:
+            await run(mode, seconds, clients, team_ids, athlete_ids, flush_ms, batch_rows)
+    finally:
+        async with db.writer() as conn:
+            await conn.execute(db.team_ratings.delete().where(db.team_ratings.c.team_rating_id > last_team_rating))
+            await conn.execute(db.athlete_ratings.delete().where(
+                db.athlete_ratings.c.athlete_rating_id > last_athlete_rating))
+        with db.engine.begin() as conn:
+            rollups.rebuild_rating_stats(conn)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--flush-ms", type=int, default=50)
+    parser.add_argument("--batch-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.seconds, args.clients, args.flush_ms, args.batch_rows))
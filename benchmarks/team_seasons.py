@@ -0,0 +1,67 @@
+"""
+Times GET /teams/{team_id} season stats against the per-season queries it replaced.
+Intended for the 100k-game dataset from src/populate_fake_data.py:
+
+    POSTGRES_DB=<fake data db> python -m benchmarks.team_seasons --rounds 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import sqlalchemy
+from sqlalchemy import extract
+
+from src import database as db
+from src.api import teams
+
+SEASONS = list(range(2019, 2024))
+
+
+async def legacy_team_stats(conn, team_id):
+    # the previous implementation: one extract()-filtered scan per season, tallied in Python
+    stats = []
+    for year in SEASONS:
+        games = sqlalchemy.select(db.games.c.home, db.games.c.away, db.games.c.pts_home, db.games.c.pts_away).where(
+            ((db.games.c.home == team_id) | (db.games.c.away == team_id)) &
+            (((extract("year", db.games.c.date) == year) & (extract("month", db.games.c.date) < 10)) |
+             ((extract("year", db.games.c.date) == year - 1) & (extract("month", db.games.c.date) >= 10))))
+        wins = games_played = 0
+        for row in await conn.execute(games):
+            games_played += 1
+            wins += (row.home if row.pts_home > row.pts_away else row.away) == team_id
+        stats.append((year, wins, games_played))
+    return stats
+
+
+async def time_per_team(name, run, rounds):
+    timings = []
+    for _ in range(rounds):
+        for team_id in range(30):
+            start = time.perf_counter()
+            await run(team_id)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{name:>8}: median {statistics.median(timings) * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms per team")
+
+
+async def legacy(team_id):
+    async with db.reader() as conn:
+        await legacy_team_stats(conn, team_id)
+
+
+async def main(rounds):
+    async with db.reader() as conn:
+        count = (await conn.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(db.games))).scalar_one()
+    print(f"{count} games")
+    await time_per_team("legacy", legacy, rounds)
+    await time_per_team("get_team", teams.get_team, rounds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rounds))
@@ -0,0 +1,70 @@
+"""
+Drives a running server with many concurrent clients and reports requests/sec and latency.
+
+To compare the sync and async handlers, start the server from each revision in turn
+(e.g. `git checkout <sync revision>`), then point this at it:
+
+    uvicorn src.api.server:app --port 3000 --workers 1
+    python -m benchmarks.throughput --url http://localhost:3000 --clients 200 --seconds 30
+
+Each client loops over a mix of read endpoints for the given duration.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+PATHS = [
+    "/teams/{team_id}",
+    "/teams/{team_id}?year=2022",
+    "/athletes/{athlete_id}",
+    "/games/?home_team_id={team_id}&away_team_id={other_team_id}",
+    "/predictions/team?team_id={team_id}",
+]
+
+
+def random_path(max_athlete_id):
+    team_id, other_team_id = random.sample(range(30), 2)
+    return random.choice(PATHS).format(team_id=team_id, other_team_id=other_team_id,
+                                       athlete_id=random.randint(0, max_athlete_id))
+
+
+async def client_loop(client, deadline, max_athlete_id, latencies, errors):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(random_path(max_athlete_id))
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError as error:
+            errors.append(type(error).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def main(url, clients, seconds, max_athlete_id):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(client_loop(client, deadline, max_athlete_id, latencies, errors)
+                               for _ in range(clients)))
+
+    latencies.sort()
+    print(f"{clients} clients, {seconds}s: {len(latencies) / seconds:.1f} req/s, {len(errors)} errors")
+    print(f"latency p50 {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:3000")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=int, default=30)
+    parser.add_argument("--max-athlete-id", type=int, default=968)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.url, args.clients, args.seconds, args.max_athlete_id))
@@ -1,17 +1,24 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from enum import Enum
+import csv
+import json
 import sqlalchemy
 from fastapi.params import Query
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import IntegrityError
 
 from src import database as db
+from src import rollups
+from src.api import bulk, name_index
+from src.api.pagination import PaginationModes, keyset_page, next_page
+from src.api.search import SearchModes, fuzzy_match
 from typing import List
 from pydantic import BaseModel
 
 router = APIRouter()
 
 @router.get("/athletes/{id}", tags=["athletes"])
-def get_athlete(id: int,
+async def get_athlete(id: int,
                 year: int = None
                 ): 
     """ 
@@ -31,22 +38,30 @@ def get_athlete(id: int,
     if year and not (2019 <= year <= 2023):
         raise HTTPException(status_code=400, detail="please enter a year within 2019 to 2023 (inclusive)")
 
-    athlete = sqlalchemy.select(db.athlete_stats, db.athletes, db.teams).select_from(
-        db.athletes.join(db.athlete_stats, isouter=True).join(db.teams, isouter=True)
-    ).where(db.athletes.c.athlete_id == id)
-
-    with db.engine.begin() as conn:
-        name = conn.execute(athlete).fetchone()
-
-        if not name:
+    # the year filter sits in the join condition, so an athlete without matching seasons
+    # still comes back as a single row with null stats
+    seasons = db.athlete_stats.c.athlete_id == db.athletes.c.athlete_id
+    if year:
+        seasons &= db.athlete_stats.c.year == year
+
+    athlete = sqlalchemy.select(
+        db.athletes.c.name,
+        *[column for column in db.athlete_stats.c if column.name != "athlete_id"],
+        db.teams.c.team_name
+    ).select_from(
+        db.athletes.outerjoin(db.athlete_stats, seasons)
+            .outerjoin(db.teams, db.teams.c.team_id == db.athlete_stats.c.team_id)
+    ).where(db.athletes.c.athlete_id == id).order_by(db.athlete_stats.c.year)
+
+    async with db.reader() as conn:
+        athlete = (await conn.execute(athlete)).fetchall()
+
+        if not athlete:
             raise HTTPException(status_code=404, detail="athlete not found.")
 
-        if year:
-            athlete = athlete.where(db.athlete_stats.c.year == year)
-
-        athlete = conn.execute(athlete).fetchall()
+        name = athlete[0]
 
-        if len(athlete) == 0 or not athlete[0].year:
+        if not athlete[0].year:
             stats = []
         else:
             stats = [{
@@ -88,74 +103,142 @@ class StatOptions(str, Enum):
     points = "points"
 
 
+MAX_COMPARE_ATHLETES = 1000
+
+
 @router.get("/athletes/compare_athletes/", tags=["athletes"])
-def compare_athletes(
+async def compare_athletes(
         year: int,
         athlete_ids: List[int] = Query(None),
         stat: StatOptions = StatOptions.points,
+        stats: List[StatOptions] = Query(None),
+        order_by: StatOptions = None,
 ):
     """ 
     This endpoint returns a comparison between the specified athletes, 
-    and returns the athlete id, name, and stat as specified in the input.  
-    It allows the user to compare athletes by a stat in `StatOptions`
+    and returns the athlete id, name, and stats as specified in the input.  
+    It allows the user to compare athletes by any of the stats in `StatOptions`
     * `year`: the year to compare the athletes
-    * `athlete_ids`: list of athlete names to compare (must have length >1)
+    * `athlete_ids`: list of athlete ids to compare (must have length >1, at most 1000 distinct ids)
     * `stat`: stat to compare athletes by (defaults to points)
-    If the stat is none, then the athlete has no data for the given year.
+    * `stats`: several stats to return at once, used instead of `stat` when given
+    * `order_by`: stat to sort the athletes by, highest first (defaults to the first stat)
+    If a stat is none, then the athlete has no data for the given year. Those athletes are listed last.
     """
     if not (2019 <= year <= 2023):
         raise HTTPException(status_code=400, detail="please enter a year within 2019 to 2023 (inclusive)")
 
-    if not athlete_ids or len(athlete_ids) < 2:
+    athlete_ids = list(dict.fromkeys(athlete_ids or []))
+    if len(athlete_ids) < 2:
         raise HTTPException(status_code=400, detail="athlete list given does not contain enough athletes.")
-
-    athlete_stats = sqlalchemy.select(db.athlete_stats, db.athletes).select_from(
-        db.athletes.join(db.athlete_stats, isouter=True)
+    if len(athlete_ids) > MAX_COMPARE_ATHLETES:
+        raise HTTPException(status_code=400,
+                            detail=f"at most {MAX_COMPARE_ATHLETES} athletes can be compared at once.")
+
+    stats = list(dict.fromkeys(stats or [stat]))
+    order_by = order_by or stats[0]
+
+    # the ids go over as a single array parameter, so the statement is the same for any number of them
+    athlete_stats = sqlalchemy.select(
+        db.athletes.c.athlete_id,
+        db.athletes.c.name,
+        *[db.athlete_stats.c[option.value] for option in dict.fromkeys(stats + [order_by])]
+    ).select_from(
+        db.athletes.outerjoin(db.athlete_stats, (db.athlete_stats.c.athlete_id == db.athletes.c.athlete_id) &
+                              (db.athlete_stats.c.year == year))
     ).where(
-        (db.athletes.c.athlete_id.in_(athlete_ids) & (db.athlete_stats.c.year == year))
+        db.athletes.c.athlete_id == sqlalchemy.any_(
+            sqlalchemy.bindparam("athlete_ids", athlete_ids, type_=postgresql.ARRAY(sqlalchemy.Integer)))
     ).order_by(
-        sqlalchemy.desc(sqlalchemy.column(stat)))
+        db.athlete_stats.c[order_by.value].desc().nulls_last(), db.athletes.c.athlete_id)
 
-    with db.engine.begin() as conn:
-        result = conn.execute(athlete_stats).fetchall()
+    async with db.reader() as conn:
+        result = (await conn.execute(athlete_stats)).fetchall()
 
-        json = [
-            {
-                "athlete_id": row.athlete_id,
-                "name": row.name,
-                stat.value: getattr(row, stat)
-            }
-            for row in result]
-
-        included_ids = [athlete.get("athlete_id") for athlete in json]
-        excluded_ids = [x for x in athlete_ids if x not in included_ids]
-
-        excluded_athletes_stmt = sqlalchemy.select(db.athletes.c.athlete_id, db.athletes.c.name).where(sqlalchemy.column('athlete_id').in_(excluded_ids))
-        excluded_names = conn.execute(excluded_athletes_stmt).fetchall()
-
-        for row in excluded_names:
-            json.append(
-                {
-                    "athlete_id": row.athlete_id,
-                    "name": row.name,
-                    stat.value: None
-                }
-            )
+    json = [
+        {
+            "athlete_id": row.athlete_id,
+            "name": row.name,
+            **{option.value: getattr(row, option.value) for option in stats}
+        }
+        for row in result]
     return json
+
+
+MAX_LEADERS = 100
+
+
+@router.get("/athletes/leaders/", tags=["athletes"])
+async def get_leaders(year: int, stat: StatOptions = StatOptions.points, k: int = Query(10, ge=1, le=MAX_LEADERS)):
+    """
+    This endpoint returns the `k` athletes with the highest value of `stat` in `year`,
+    highest first, with their athlete id, name and that stat.
+    * `year`: the season to rank
+    * `stat`: stat to rank athletes by (defaults to points)
+    * `k`: number of athletes to return (defaults to 10, at most 100)
+    Athletes tied on the stat are ordered by athlete id.
+    """
+    if not (2019 <= year <= 2023):
+        raise HTTPException(status_code=400, detail="please enter a year within 2019 to 2023 (inclusive)")
+
+    # ix_athlete_stats_year_<stat> is ordered exactly like this, so only the first k entries are read
+    leaders = sqlalchemy.select(
+        db.athlete_stats.c.athlete_id, db.athlete_stats.c[stat.value]
+    ).where(
+        db.athlete_stats.c.year == year
+    ).order_by(
+        db.athlete_stats.c[stat.value].desc(), db.athlete_stats.c.athlete_id
+    ).limit(k).subquery()
+    stmt = sqlalchemy.select(
+        leaders.c.athlete_id, db.athletes.c.name, leaders.c[stat.value]
+    ).join(
+        db.athletes, db.athletes.c.athlete_id == leaders.c.athlete_id
+    ).order_by(leaders.c[stat.value].desc(), leaders.c.athlete_id)
+
+    async with db.reader() as conn:
+        result = (await conn.execute(stmt)).fetchall()
+
+    return [{"athlete_id": row.athlete_id, "name": row.name, stat.value: row[2]} for row in result]
+
+
+@router.get("/athletes/autocomplete/", tags=["athletes"])
+async def autocomplete_athletes(q: str = Query(..., min_length=1),
+                                k: int = Query(10, ge=1, le=50)):
+    """
+    This endpoint suggests athletes for a partially typed name, without querying the database.
+    It returns up to `k` athletes with a name or a word of their name starting with `q`
+    (ignoring case and accents). For each athlete it returns:
+    * `athlete_id`: the internal id of the athlete
+    * `name`: The name of the athlete
+    """
+    await name_index.athlete_names.load()
+    return [{"athlete_id": athlete_id, "name": name} for athlete_id, name in name_index.athlete_names.prefix(q, k)]
+
+
 @router.get("/athletes/list_athletes/", tags=["athletes"])
-def list_athletes(name: str = "",
+async def list_athletes(name: str = "",
             limit: int = Query(250, ge=1, le=250),
-            offset: int = Query(0, ge=0)
+            offset: int = Query(0, ge=0),
+            pagination: PaginationModes = PaginationModes.offset,
+            cursor: str = None,
+            search: SearchModes = SearchModes.substring
             ):
     """
-    This endpoint returns a list of athletes. For each athlete it returns:
+    This endpoint returns a list of athletes, ordered by id. For each athlete it returns:
     * `athlete_id`: the internal id of the athlete
     * `athlete_name`: The name of the athlete
 
-    The `limit` and `offset` query
-    parameters are used for pagination. The `limit` query parameter specifies the
-    maximum number of results to return. The `offset` query parameter specifies the
+    The `limit` query parameter specifies the maximum number of results to return.
+    With the default `pagination=offset`, the `offset` query parameter specifies the
     number of results to skip before returning results.
+
+    With `pagination=keyset` the endpoint returns `{"results": [...], "next_cursor": ...}`
+    instead. Pass `next_cursor` back as `cursor` to get the following page; it is null on
+    the last page. Deep pages stay as fast as the first one in this mode.
+
+    By default `name` matches athletes whose name contains it. With `search=fuzzy` the
+    endpoint instead returns the names most similar to `name`, best match first, each with
+    a similarity `score` between 0 and 1, so misspelled names are still found.
     """
 
     stmt = (
@@ -163,63 +246,45 @@ def list_athletes(name: str = "",
             db.athletes.c.athlete_id,
             db.athletes.c.name
         )
-            .limit(limit)
-            .offset(offset)
     )
 
+    keyset = pagination == PaginationModes.keyset or cursor is not None
+    fuzzy = search == SearchModes.fuzzy
+    if fuzzy:
+        if name == "":
+            raise HTTPException(status_code=400, detail="fuzzy search needs a name to search for.")
+        if keyset:
+            raise HTTPException(status_code=400, detail="fuzzy search results can only be paginated by offset.")
+        matches, score = fuzzy_match(db.athletes.c.name, name)
+        stmt = stmt.add_columns(score.label("score")).where(matches).order_by(score.desc())
+
     # filter only if name parameter is passed
-    if name != "":
+    elif name != "":
         stmt = stmt.where(db.athletes.c.name.ilike(f"%{name}%"))
 
-    with db.engine.connect() as conn:
-        result = conn.execute(stmt)
-        json = [{
-            "athlete_id": row.athlete_id,
-            "athlete name": row.name,
-        }
-            for row in result]
-
-    return json
-
-@router.post("/athletes/{athlete_name}", tags=["athletes"])
-def add_athlete(name: str):
-    """
-    This endpoint adds an athlete to the database.
-    To add stats of a season in which the athlete played, use add_athlete_stats.
-    The endpoint returns the id of the resulting athlete that was created
-    This endpoint ensures the athlete does not already exist in the database
-    * `name` a string of the name of the athlete
-    """
-
-    # perform case sensitivity
-    name = name.title() 
-
-    potential_athlete_id = sqlalchemy.select(
-        db.athletes.c.athlete_id
-    ).where(db.athletes.c.name == name)
+    if keyset:
+        stmt = keyset_page(stmt, db.athletes.c.athlete_id, limit, cursor)
+    else:
+        stmt = stmt.order_by(db.athletes.c.athlete_id).limit(limit).offset(offset)
 
-    with db.engine.begin() as conn:
-        result = conn.execute(potential_athlete_id).fetchone()
+    async with db.reader() as conn:
+        result = (await conn.execute(stmt)).fetchall()
 
-        if result:
-            raise HTTPException(status_code=400, detail="athlete already exists in database")
+    if keyset:
+        result, next_cursor = next_page(result, limit, lambda row: row.athlete_id)
 
-        athlete_id = conn.execute(
-            sqlalchemy.select(
-                db.athletes.c.athlete_id
-            )
-                .order_by(sqlalchemy.desc(db.athletes.c.athlete_id))
-                .limit(1)
-        ).scalar_one() + 1
-
-        new_athlete = {
-            "athlete_id": athlete_id,
-            "name": name
-        }
-        conn.execute(db.athletes.insert().values(**new_athlete))
-
-    return athlete_id
+    json = [{
+        "athlete_id": row.athlete_id,
+        "athlete name": row.name,
+    }
+        for row in result]
+    if fuzzy:
+        for athlete, row in zip(json, result):
+            athlete["score"] = round(row.score, 3)
 
+    if keyset:
+        return {"results": json, "next_cursor": next_cursor}
+    return json
 
 class AthleteStats(BaseModel):
     games_played: int
@@ -242,8 +307,9 @@ class AthleteJson(BaseModel):
     stats: AthleteStats
 
 
+# declared before /athletes/{athlete_name}, which would otherwise capture POST /athletes/season
 @router.post("/athletes/season", tags=["athletes"])
-def add_athlete_season(athlete: AthleteJson):
+async def add_athlete_season(athlete: AthleteJson):
     """
     This endpoint adds the stats from an athlete's season to the database.
     The athlete is represented by the AthleteJson, which contains
@@ -262,8 +328,10 @@ def add_athlete_season(athlete: AthleteJson):
 
     athlete_name_stmt = sqlalchemy.select(db.athletes.c.name).where(db.athletes.c.athlete_id == athlete.athlete_id)
 
-    with db.engine.begin() as conn:
-        athlete_name = conn.execute(athlete_name_stmt).fetchone()
+    # READ COMMITTED, so concurrent inserts wait on the max_athlete_stats row lock instead of
+    # failing serialization; the update re-reads the row and only ever raises the maxima
+    async with db.writer(isolation_level="READ COMMITTED") as conn:
+        athlete_name = (await conn.execute(athlete_name_stmt)).fetchone()
 
         new_athlete_season = {
             "athlete_id": athlete.athlete_id,
@@ -283,7 +351,7 @@ def add_athlete_season(athlete: AthleteJson):
         }
 
         try:
-            conn.execute(db.athlete_stats.insert().values(**new_athlete_season))
+            await conn.execute(db.athlete_stats.insert().values(**new_athlete_season))
         except IntegrityError as integrity_error:
             error_message = str(integrity_error)
             start_index = error_message.find('constraint') + len('constraint') + 2
@@ -291,11 +359,195 @@ def add_athlete_season(athlete: AthleteJson):
             constraint_name = error_message[start_index:end_index].strip()
             raise HTTPException(status_code=404, detail="Constraint violated: " + str(constraint_name))
 
-        refresh_max_athletes = sqlalchemy.text('''
-        REFRESH MATERIALIZED VIEW max_athlete_stats;
-        ''')
-        conn.execute(refresh_max_athletes)
+        await rollups.update_max_athlete_stats(conn, [(athlete.athlete_id, athlete.year)])
 
     return f"{athlete_name.name}: {athlete.year}"
 
 
+SEASON_COLUMNS = ["athlete_id", "year", "age", "team_id", *AthleteStats.__fields__]
+SEASON_CONVERTERS = [(column, bulk.to_float if column in ("field_goal_percentage", "free_throw_percentage")
+                      else bulk.to_int)
+                     for column in SEASON_COLUMNS]
+BULK_BATCH_SIZE = 10000
+
+# rows are copied into a temporary table shaped like athlete_stats, then moved over in one INSERT
+athlete_stats_staging = db.athlete_stats.to_metadata(sqlalchemy.MetaData(), name="athlete_stats_staging")
+
+
+async def _season_rows(request, content_type):
+    """
+    (line number, values, fields) for every row of a CSV or NDJSON body, where `fields` lists
+    (column, key of the column in `values`, converter) for every column of SEASON_COLUMNS,
+    or (line number, error, None) for rows that can't be parsed at all (or aren't valid UTF-8).
+    """
+    line_number = 0
+    if content_type == "text/csv":
+        fields = header = None
+        async for lines in bulk.body_lines(request):
+            for line, values in zip(lines, csv.reader("" if line is None else line for line in lines)):
+                line_number += 1
+                if line is None:
+                    yield line_number, "not valid UTF-8", None
+                    continue
+                if not values:
+                    continue
+                if header is None:
+                    header = [column.strip() for column in values]
+                    missing = set(SEASON_COLUMNS) - set(header)
+                    if missing:
+                        raise HTTPException(status_code=400,
+                                            detail="CSV header is missing columns: " + ", ".join(sorted(missing)))
+                    fields = [(column, header.index(column), convert) for column, convert in SEASON_CONVERTERS]
+                elif len(values) != len(header):
+                    yield line_number, f"expected {len(header)} fields, found {len(values)}", None
+                else:
+                    yield line_number, values, fields
+    else:
+        fields = [(column, column, convert) for column, convert in SEASON_CONVERTERS]
+        async for lines in bulk.body_lines(request):
+            for line in lines:
+                line_number += 1
+                if line is None:
+                    yield line_number, "not valid UTF-8", None
+                    continue
+                if not line.strip():
+                    continue
+                try:
+                    season = json.loads(line)
+                    yield line_number, {**season.get("stats", {}), **season}, fields
+                except (ValueError, TypeError, AttributeError):
+                    yield line_number, "not a JSON object", None
+
+
+def _season_record(values, fields, athlete_ids, team_ids):
+    """The athlete_stats row for one parsed season, as a tuple in SEASON_COLUMNS order, or an error message."""
+    try:
+        record = tuple([convert(values[key]) for _, key, convert in fields])
+    except (KeyError, ValueError, TypeError):
+        for column, key, convert in fields:
+            try:
+                convert(values[key])
+            except KeyError:
+                return f"missing {column}"
+            except (ValueError, TypeError):
+                return f"invalid {column}: {values[key]!r}"
+
+    athlete_id, year, _, team_id = record[:4]
+    if not (2019 <= year <= 2023):
+        return "year must be within 2019 to 2023 (inclusive)"
+    if athlete_id not in athlete_ids:
+        return f"athlete {athlete_id} does not exist"
+    if team_id not in team_ids:
+        return f"team {team_id} does not exist"
+    return record
+
+
+@router.post("/athletes/season/bulk", tags=["athletes"])
+async def add_athlete_seasons(request: Request, atomic: bool = False):
+    """
+    This endpoint adds many athlete seasons at once. The body is either
+    * CSV (`Content-Type: text/csv`) with a header row naming the columns `athlete_id`, `year`,
+      `age`, `team_id` and every stat in `StatOptions`, or
+    * NDJSON (`Content-Type: application/x-ndjson`), one AthleteJson object per line, as taken
+      by `/athletes/season`
+
+    Every row is checked the same way as in `/athletes/season`. Valid rows are added and
+    the others are reported, unless `atomic` is set, in which case any error adds nothing.
+    The endpoint returns the number of seasons added and, for each rejected row, its line
+    number and what was wrong (the first 1000 of them, with `error_count` counting all).
+    """
+    content_type = bulk.content_type(request, ("text/csv", *bulk.NDJSON_TYPES))
+
+    errors = []
+    lines = {}  # (athlete_id, year) -> line, to find duplicates and report conflicts
+
+    def reject(line_number, error):
+        errors.append({"line": line_number, "error": error})
+
+    async with db.writer(isolation_level="READ COMMITTED") as conn:
+        # fetched with .all(): iterating a result row by row is quadratic in its size with asyncpg
+        athlete_ids = set((await conn.execute(sqlalchemy.select(db.athletes.c.athlete_id))).scalars().all())
+        team_ids = set((await conn.execute(sqlalchemy.select(db.teams.c.team_id))).scalars().all())
+
+        await conn.execute(sqlalchemy.text(
+            "CREATE TEMPORARY TABLE athlete_stats_staging (LIKE athlete_stats) ON COMMIT DROP"))
+
+        batch = []
+        async for line_number, values, fields in _season_rows(request, content_type):
+            record = values if fields is None else _season_record(values, fields, athlete_ids, team_ids)
+            if isinstance(record, str):
+                reject(line_number, record)
+            elif record[:2] in lines:
+                reject(line_number, f"duplicate of line {lines[record[:2]]}")
+            else:
+                lines[record[:2]] = line_number
+                batch.append(record)
+                if len(batch) >= BULK_BATCH_SIZE:
+                    await bulk.copy_records(conn, "athlete_stats_staging", batch, SEASON_COLUMNS)
+                    batch = []
+        if batch:
+            await bulk.copy_records(conn, "athlete_stats_staging", batch, SEASON_COLUMNS)
+
+        if atomic and errors:
+            raise HTTPException(status_code=400, detail=bulk.error_report(errors))
+
+        staged = sqlalchemy.select(*[athlete_stats_staging.c[column] for column in SEASON_COLUMNS])
+        added = await conn.execute(
+            postgresql.insert(db.athlete_stats)
+                .from_select(SEASON_COLUMNS, staged)
+                .on_conflict_do_nothing(index_elements=["athlete_id", "year"])
+                .returning(db.athlete_stats.c.athlete_id, db.athlete_stats.c.year)
+        )
+        inserted = set(map(tuple, added.all()))
+
+        conflicts = [key for key in lines if key not in inserted]
+        for athlete_id, year in conflicts:
+            reject(lines[(athlete_id, year)], f"athlete {athlete_id} already has a season for {year}")
+        if conflicts:
+            if atomic:
+                raise HTTPException(status_code=400, detail=bulk.error_report(errors))
+            ids, years = zip(*conflicts)
+            int_array = postgresql.ARRAY(sqlalchemy.Integer)
+            conflicting = sqlalchemy.select(sqlalchemy.func.unnest(sqlalchemy.cast(list(ids), int_array)),
+                                            sqlalchemy.func.unnest(sqlalchemy.cast(list(years), int_array)))
+            await conn.execute(athlete_stats_staging.delete().where(
+                sqlalchemy.tuple_(athlete_stats_staging.c.athlete_id, athlete_stats_staging.c.year).in_(conflicting)))
+
+        # the staging table now holds exactly the rows that were added
+        await rollups.update_max_athlete_stats_from(conn, athlete_stats_staging)
+
+    errors.sort(key=lambda error: error["line"])
+    return {"inserted": len(inserted), **bulk.error_report(errors)}
+
+
+@router.post("/athletes/{athlete_name}", tags=["athletes"])
+async def add_athlete(name: str):
+    """
+    This endpoint adds an athlete to the database.
+    To add stats of a season in which the athlete played, use add_athlete_stats.
+    The endpoint returns the id of the resulting athlete that was created
+    This endpoint ensures the athlete does not already exist in the database
+    * `name` a string of the name of the athlete
+    """
+
+    # perform case sensitivity
+    name = name.title() 
+
+    exists = sqlalchemy.exists().where(db.athletes.c.name == name)
+    insert = (
+        db.athletes.insert()
+            .from_select(["name"], sqlalchemy.select(sqlalchemy.literal(name)).where(~exists))
+            .returning(db.athletes.c.athlete_id)
+    )
+
+    # READ COMMITTED with a lock on the name: concurrent inserts of different athletes never
+    # conflict, while two inserts of the same name wait for each other instead of both succeeding
+    async with db.writer(isolation_level="READ COMMITTED") as conn:
+        await conn.execute(sqlalchemy.select(sqlalchemy.func.pg_advisory_xact_lock(sqlalchemy.func.hashtext(name))))
+        athlete_id = (await conn.execute(insert)).scalar_one_or_none()
+
+    if athlete_id is None:
+        raise HTTPException(status_code=400, detail="athlete already exists in database")
+
+    name_index.athlete_names.add(athlete_id, name)
+    return athlete_id
@@ -0,0 +1,66 @@
+from fastapi import HTTPException
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl")
+MAX_REPORTED_ERRORS = 1000
+
+
+def content_type(request, accepted):
+    """The request's media type, which must be one of `accepted`; a 415 otherwise."""
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if media_type not in accepted:
+        raise HTTPException(status_code=415, detail="send " + " or ".join(accepted))
+    return media_type
+
+
+def _decode_line(line):
+    try:
+        return line.decode()
+    except UnicodeDecodeError:
+        return None
+
+
+def _decode(lines):
+    try:
+        return b"\n".join(lines).decode().split("\n")
+    except UnicodeDecodeError:
+        return [_decode_line(line) for line in lines]
+
+
+async def body_lines(request):
+    """The request body as it arrives, in lists of decoded lines, with None for a line that isn't valid UTF-8."""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        if lines:
+            yield _decode(lines)
+    if pending:
+        yield [_decode_line(pending)]
+
+
+def to_int(value):
+    """
+    int() of a JSON number or a numeric string, without truncating: booleans and
+    fractional numbers raise a ValueError rather than becoming 1/0 or losing their fraction.
+    """
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"not an integer: {value!r}")
+    return int(value)
+
+
+def to_float(value):
+    """float() of a JSON number or a numeric string; booleans raise a ValueError."""
+    if isinstance(value, bool):
+        raise ValueError(f"not a number: {value!r}")
+    return float(value)
+
+
+def error_report(errors):
+    """The first MAX_REPORTED_ERRORS errors and how many there were in all."""
+    return {"errors": errors[:MAX_REPORTED_ERRORS], "error_count": len(errors)}
+
+
+async def copy_records(conn, table_name, records, columns):
+    """COPYs `records` (tuples in `columns` order) into a table, in the caller's transaction."""
+    driver_connection = (await conn.get_raw_connection()).driver_connection
+    await driver_connection.copy_records_to_table(table_name, records=records, columns=columns)
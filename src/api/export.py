@@ -0,0 +1,89 @@
+"""
+Whole-table exports for analytics, streamed as NDJSON or CSV.
+
+Rows are read through a server-side cursor in batches of EXPORT_BATCH_SIZE and each batch is
+encoded and sent before the next is fetched, so memory use doesn't depend on the size of the
+table. Exports are ordered by primary key; an interrupted one resumes from the last row received.
+"""
+import csv
+import io
+import json
+from enum import Enum
+
+import sqlalchemy
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from src import database as db
+
+router = APIRouter()
+
+EXPORT_BATCH_SIZE = 5000
+
+
+class ExportFormats(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {ExportFormats.ndjson: "application/x-ndjson", ExportFormats.csv: "text/csv"}
+
+
+def _encode(rows, columns, export_format):
+    if export_format == ExportFormats.ndjson:
+        return "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+
+async def export_rows(stmt, export_format):
+    """Encoded chunks of every row of `stmt`, one chunk per batch, preceded by a header row for CSV."""
+    columns = [column.name for column in stmt.selected_columns]
+    if export_format == ExportFormats.csv:
+        yield _encode([columns], columns, export_format)
+    async with db.reader() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield _encode(rows, columns, export_format)
+
+
+def _stream(stmt, export_format, name):
+    return StreamingResponse(
+        export_rows(stmt, export_format), media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format.value}"'})
+
+
+@router.get("/export/games", tags=["export"])
+async def export_games(export_format: ExportFormats = ExportFormats.ndjson, after_game_id: int = None):
+    """
+    This endpoint streams every game, ordered by `game_id`, with all of its columns,
+    as NDJSON (one object per line) or as CSV with a header row (`export_format=csv`).
+
+    To resume an interrupted export, pass the `game_id` of the last game received
+    as `after_game_id`.
+    """
+    stmt = sqlalchemy.select(db.games).order_by(db.games.c.game_id)
+    if after_game_id is not None:
+        stmt = stmt.where(db.games.c.game_id > after_game_id)
+    return _stream(stmt, export_format, "games")
+
+
+@router.get("/export/athlete_stats", tags=["export"])
+async def export_athlete_stats(export_format: ExportFormats = ExportFormats.ndjson,
+                               after_athlete_id: int = None,
+                               after_year: int = None):
+    """
+    This endpoint streams every athlete season, ordered by `athlete_id` then `year`, with all
+    of its columns, as NDJSON (one object per line) or as CSV with a header row (`export_format=csv`).
+
+    To resume an interrupted export, pass the `athlete_id` and `year` of the last row received
+    as `after_athlete_id` and `after_year`.
+    """
+    stats = db.athlete_stats.c
+    stmt = sqlalchemy.select(db.athlete_stats).order_by(stats.athlete_id, stats.year)
+    if (after_athlete_id is None) != (after_year is None):
+        raise HTTPException(status_code=400, detail="give both after_athlete_id and after_year to resume.")
+    if after_athlete_id is not None:
+        stmt = stmt.where(sqlalchemy.tuple_(stats.athlete_id, stats.year) > (after_athlete_id, after_year))
+    return _stream(stmt, export_format, "athlete_stats")
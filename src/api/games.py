@@ -1,7 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.params import Query
+import json
 import sqlalchemy
 from datetime import date
+from sqlalchemy.exc import IntegrityError
 from src import database as db
+from src import rollups
+from src.api import bulk
+from src.api.pagination import keyset_page, next_page
 from pydantic import BaseModel
 from enum import Enum
 
@@ -13,11 +19,55 @@ class winner_options(str, Enum):
     away = "away"
 
 
+MAX_GAMES_PAGE = 1000
+# a search without a team can't read its games in order from an index: every page reads and sorts
+# all the games in the block ranges from the cursor's date to `until`, so the range is capped
+MAX_SEARCH_DAYS = 366
+
+
+def _with_team_names(games):
+    """
+    Select of the games in `games` (the games table or a subquery of its rows) with the
+    names of both teams and of the winner, ties going to the away team.
+    """
+    home_team = db.teams.alias("home_team")
+    away_team = db.teams.alias("away_team")
+    return sqlalchemy.select(
+        games.c.game_id,
+        home_team.c.team_name.label("home_team"),
+        away_team.c.team_name.label("away_team"),
+        sqlalchemy.case((games.c.pts_home > games.c.pts_away, home_team.c.team_name),
+                        else_=away_team.c.team_name).label("winner"),
+        games.c.pts_home,
+        games.c.pts_away,
+        games.c.date
+    ).select_from(
+        games
+            .join(home_team, home_team.c.team_id == games.c.home)
+            .join(away_team, away_team.c.team_id == games.c.away)
+    )
+
+
+def _game_json(game):
+    return {"game_id": game.game_id,
+            "home_team": game.home_team,
+            "away_team": game.away_team,
+            "winner": game.winner,
+            "home_team_score": game.pts_home,
+            "away_team_score": game.pts_away,
+            "date": str(game.date)}
+
+
 @router.get("/games/", tags=["games"])
-def get_game(
+async def get_game(
         home_team_id: int,
         away_team_id: int,
-        winner: winner_options = None
+        winner: winner_options = None,
+        since: date = None,
+        until: date = None,
+        both_directions: bool = False,
+        limit: int = Query(None, ge=1, le=MAX_GAMES_PAGE),
+        cursor: str = None
 ):
     """
     This endpoint returns a list of games by the teams provided ordered by date
@@ -30,49 +80,113 @@ def get_game(
     * `home_team_score`: score of home team
     * `away_team_score`: score of away team
     * `date`: the date the game was held
+
+    The games can be narrowed down with
+    * `winner`: only games won by the team given as `home_team_id` (`home`) or `away_team_id` (`away`)
+    * `since`, `until`: only games held on or after / on or before these dates
+    * `both_directions`: also include the games where `away_team_id` was the home team
+
+    The endpoint returns a 404 when the teams have played no games (in the directions asked for);
+    when they have but none match `winner`, `since` or `until`, the list is empty.
+
+    When `limit` is given, the endpoint returns `{"results": [...], "next_cursor": ...}` with at
+    most `limit` games (up to 1000). Pass `next_cursor` back as `cursor` to get the following
+    page; it is null on the last page.
     """
     if home_team_id == away_team_id:
         raise HTTPException(status_code=400, detail="Home team and away team cannot be the same")
 
-    home_team_stmt = sqlalchemy.select(db.teams.c.team_name).where(db.teams.c.team_id == home_team_id)
-    away_team_stmt = sqlalchemy.select(db.teams.c.team_name).where(db.teams.c.team_id == away_team_id)
-
-    with db.engine.begin() as conn:
-        result = conn.execute(
-            sqlalchemy.select(
-                db.games.c.game_id,
-                db.games.c.home,
-                db.games.c.away,
-                db.games.c.pts_home,
-                db.games.c.pts_away,
-                db.games.c.date
-            ).where((db.games.c.home == home_team_id) & (db.games.c.away == away_team_id))
-                .order_by(db.games.c.date)
-        ).fetchall()
-
-        if len(result) == 0:
+    games = db.games.c
+    home_won = games.pts_home > games.pts_away
+
+    matchup = (games.home == home_team_id) & (games.away == away_team_id)
+    if both_directions:
+        matchup = matchup | ((games.home == away_team_id) & (games.away == home_team_id))
+
+    stmt = _with_team_names(db.games).where(matchup)
+
+    if winner is not None:
+        winner_id = home_team_id if winner == winner_options.home else away_team_id
+        stmt = stmt.where(sqlalchemy.case((home_won, games.home), else_=games.away) == winner_id)
+    if since is not None:
+        stmt = stmt.where(games.date >= since)
+    if until is not None:
+        stmt = stmt.where(games.date <= until)
+
+    keyset = limit is not None or cursor is not None
+    if keyset:
+        limit = limit or MAX_GAMES_PAGE
+        stmt = keyset_page(stmt, (games.date, games.game_id), limit, cursor)
+    else:
+        stmt = stmt.order_by(games.date, games.game_id)
+
+    async with db.reader() as conn:
+        result = (await conn.execute(stmt)).fetchall()
+        # a 404 means the teams never played each other; filters that match none of their games give no results
+        filtered = winner is not None or since is not None or until is not None
+        if len(result) == 0 and cursor is None and (
+                not filtered or not (await conn.execute(sqlalchemy.select(sqlalchemy.exists().where(matchup)))).scalar()):
             raise HTTPException(status_code=404, detail="No games found")
 
-        home_team = conn.execute(home_team_stmt).scalar_one()
-        away_team = conn.execute(away_team_stmt).scalar_one()
+    if keyset:
+        result, next_cursor = next_page(result, limit, lambda game: (game.date, game.game_id))
+
+    json = [_game_json(game) for game in result]
+
+    if keyset:
+        return {"results": json, "next_cursor": next_cursor}
+    return json
+
+
+@router.get("/games/search/", tags=["games"])
+async def search_games(
+        since: date = None,
+        until: date = None,
+        team_id: int = None,
+        limit: int = Query(100, ge=1, le=MAX_GAMES_PAGE),
+        cursor: str = None
+):
+    """
+    This endpoint returns the games held between two dates, ordered by date,
+    as `{"results": [...], "next_cursor": ...}` with the same fields per game as `/games/`.
+    * `since`, `until`: only games held on or after / on or before these dates
+    * `team_id`: only the games this team played, at home or away
+    * `limit`: maximum number of games to return (defaults to 100, at most 1000)
+
+    Without `team_id`, both `since` and `until` are required and may be at most 366 days apart.
 
-        json = [
-            {"game_id": game.game_id,
-             "home_team": home_team,
-             "away_team": away_team,
-             "winner": home_team if game.pts_home > game.pts_away else away_team,
-             "home_team_score": game.pts_home,
-             "away_team_score": game.pts_away,
-             "date": str(game.date)}
-            for game in result
-        ]
+    Pass `next_cursor` back as `cursor` to get the following page; it is null on the last page.
+    """
+    if team_id is None and (since is None or until is None or (until - since).days > MAX_SEARCH_DAYS):
+        raise HTTPException(status_code=400,
+                            detail=f"without a team_id, give since and until at most {MAX_SEARCH_DAYS} days apart.")
+
+    games = db.games.c
+    in_range = []
+    if since is not None:
+        in_range.append(games.date >= since)
+    if until is not None:
+        in_range.append(games.date <= until)
+
+    if team_id is None:
+        # the BRIN index on date finds the block ranges from the cursor's date (or `since`) to `until`;
+        # their rows are filtered and top-N sorted for the page before the team names are joined to it
+        page = keyset_page(sqlalchemy.select(db.games).where(*in_range), (games.date, games.game_id),
+                           limit, cursor).subquery("page")
+    else:
+        # one ordered page from each of the (home, date, game_id) and (away, date, game_id) indexes,
+        # merged, rather than every game of the team sorted
+        sides = [keyset_page(sqlalchemy.select(db.games).where(side == team_id, *in_range),
+                             (games.date, games.game_id), limit, cursor)
+                 for side in (games.home, games.away)]
+        page = sqlalchemy.union_all(*sides).subquery("page")
+    stmt = _with_team_names(page).order_by(page.c.date, page.c.game_id).limit(limit + 1)
 
-        if winner == winner_options.home:
-            json = [game for game in json if game.get("winner") == home_team]
-        elif winner == winner_options.away:
-            json = [game for game in json if game.get("winner") == away_team]
+    async with db.reader() as conn:
+        result = (await conn.execute(stmt)).fetchall()
 
-        return json
+    result, next_cursor = next_page(result, limit, lambda game: (game.date, game.game_id))
+    return {"results": [_game_json(game) for game in result], "next_cursor": next_cursor}
 
 
 class GameJson(BaseModel):
@@ -92,7 +206,7 @@ class GameJson(BaseModel):
 
 
 @router.post("/games/add_game", tags=["games"])
-def add_game(game: GameJson):
+async def add_game(game: GameJson):
     """
     This endpoint adds a game to the database. The game is represented by:
     * `home_team_id`: the id of the home team
@@ -108,38 +222,150 @@ def add_game(game: GameJson):
     if game.points_home == game.points_away:
         raise HTTPException(status_code=400, detail="Point values cannot be equal")
 
-       
-    if game.home_team_id < 0 or game.home_team_id > 29:
-        raise HTTPException(status_code=400, detail="Invalid home_team_id")
-   
-    if game.away_team_id < 0 or game.away_team_id > 29:
-        raise HTTPException(status_code=400, detail="Invalid away_team_id")
-
-    with db.engine.begin() as conn:
-        game_id = conn.execute(
-            sqlalchemy.select(
-                db.games.c.game_id
-            )
-            .order_by(sqlalchemy.desc(db.games.c.game_id))
-            .limit(1)
-        ).scalar_one() + 1
-
-        postgame = {
-            "game_id": game_id,
-            "home": game.home_team_id,
-            "away": game.away_team_id,
-            "date": game.date,
-            "pts_home": game.points_home,
-            "pts_away": game.points_away,
-            "reb_home": game.rebounds_home,
-            "reb_away": game.rebounds_away,
-            "ast_home": game.assists_home,
-            "ast_away": game.assists_away,
-            "stl_home": game.steals_home,
-            "stl_away": game.steals_away,
-            "blk_home": game.blocks_home,
-            "blk_away": game.blocks_away
-        }
-        conn.execute(db.games.insert().values(**postgame))
+
+    postgame = {
+        "home": game.home_team_id,
+        "away": game.away_team_id,
+        "date": game.date,
+        "pts_home": game.points_home,
+        "pts_away": game.points_away,
+        "reb_home": game.rebounds_home,
+        "reb_away": game.rebounds_away,
+        "ast_home": game.assists_home,
+        "ast_away": game.assists_away,
+        "stl_home": game.steals_home,
+        "stl_away": game.steals_away,
+        "blk_home": game.blocks_home,
+        "blk_away": game.blocks_away
+    }
+
+    # READ COMMITTED: the id comes from the games sequence and the rollup upsert adds onto
+    # the current totals under a row lock, so concurrent games don't abort each other
+    async with db.writer(isolation_level="READ COMMITTED") as conn:
+        # the team ids are checked by the games foreign keys
+        try:
+            game_id = (await conn.execute(
+                db.games.insert().values(**postgame).returning(db.games.c.game_id)
+            )).scalar_one()
+        except IntegrityError as integrity_error:
+            if "games_home_fkey" in str(integrity_error):
+                raise HTTPException(status_code=400, detail="Invalid home_team_id")
+            if "games_away_fkey" in str(integrity_error):
+                raise HTTPException(status_code=400, detail="Invalid away_team_id")
+            raise
+        await rollups.update_team_season_stats(conn, [game_id])
 
     return game_id
+
+
+# GameJson field -> games column, in the order the columns are copied
+GAME_COLUMNS = {
+    "home_team_id": "home", "away_team_id": "away", "date": "date",
+    "points_home": "pts_home", "points_away": "pts_away",
+    "rebounds_home": "reb_home", "rebounds_away": "reb_away",
+    "assists_home": "ast_home", "assists_away": "ast_away",
+    "steals_home": "stl_home", "steals_away": "stl_away",
+    "blocks_home": "blk_home", "blocks_away": "blk_away",
+}
+GAME_CONVERTERS = [(field, date.fromisoformat if field == "date" else bulk.to_int) for field in GAME_COLUMNS]
+
+
+def _game_record(game, team_ids):
+    """The games row for one uploaded game, as a tuple in GAME_COLUMNS order, or an error message."""
+    try:
+        record = tuple([convert(game[field]) for field, convert in GAME_CONVERTERS])
+    except (KeyError, ValueError, TypeError):
+        if not isinstance(game, dict):
+            return "not a JSON object"
+        for field, convert in GAME_CONVERTERS:
+            try:
+                convert(game[field])
+            except KeyError:
+                return f"missing {field}"
+            except (ValueError, TypeError):
+                return f"invalid {field}: {game[field]!r}"
+
+    home, away, _, points_home, points_away = record[:5]
+    if home == away:
+        return "Teams are the same"
+    if points_home == points_away:
+        return "Point values cannot be equal"
+    if home not in team_ids:
+        return "Invalid home_team_id"
+    if away not in team_ids:
+        return "Invalid away_team_id"
+    return record
+
+
+async def _uploaded_games(request):
+    """Every game of a JSON list or NDJSON body, as (parsed JSON, None), or (None, error message) for unparsable lines."""
+    if bulk.content_type(request, ("application/json", *bulk.NDJSON_TYPES)) == "application/json":
+        try:
+            games = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="body is not valid JSON")
+        if not isinstance(games, list):
+            raise HTTPException(status_code=400, detail="body must be a list of games")
+        for game in games:
+            yield game, None
+    else:
+        async for lines in bulk.body_lines(request):
+            for line in lines:
+                if line is None:
+                    yield None, "not valid UTF-8"
+                elif line.strip():
+                    try:
+                        game = json.loads(line)
+                    except ValueError:
+                        yield None, "not valid JSON"
+                    else:
+                        yield game, None
+
+
+@router.post("/games/bulk", tags=["games"])
+async def add_games(request: Request, atomic: bool = False):
+    """
+    This endpoint adds many games at once. The body is either a JSON list of games
+    (`Content-Type: application/json`) or NDJSON (`Content-Type: application/x-ndjson`),
+    one game per line, each game being a GameJson as taken by `/games/add_game`.
+
+    Every game is checked the same way as in `/games/add_game`. Valid games are added and
+    the others are reported, unless `atomic` is set, in which case any error adds nothing.
+    The endpoint returns `game_ids`, the id given to each uploaded game in upload order
+    (null for rejected ones), and for each rejected game its `index` in the upload and
+    what was wrong (the first 1000 of them, with `error_count` counting all).
+    """
+    errors = []
+    records = []
+    positions = []  # index in the upload of each record
+
+    async with db.writer(isolation_level="READ COMMITTED") as conn:
+        team_ids = set((await conn.execute(sqlalchemy.select(db.teams.c.team_id))).scalars().all())
+
+        uploaded = 0
+        async for game, parse_error in _uploaded_games(request):
+            record = parse_error or _game_record(game, team_ids)
+            if isinstance(record, str):
+                errors.append({"index": uploaded, "error": record})
+            else:
+                records.append(record)
+                positions.append(uploaded)
+            uploaded += 1
+        game_ids = [None] * uploaded
+
+        if atomic and errors:
+            raise HTTPException(status_code=400, detail=bulk.error_report(errors))
+
+        if records:
+            # ids are taken from the sequence up front, so the rows can be COPYed in with them
+            new_ids = (await conn.execute(sqlalchemy.select(
+                sqlalchemy.func.nextval(sqlalchemy.func.pg_get_serial_sequence("games", "game_id"))
+            ).select_from(sqlalchemy.func.generate_series(1, len(records))))).scalars().all()
+            await bulk.copy_records(conn, "games", [(game_id, *record) for game_id, record in zip(new_ids, records)],
+                                    ["game_id", *GAME_COLUMNS.values()])
+            await rollups.update_team_season_stats(conn, new_ids)
+
+            for position, game_id in zip(positions, new_ids):
+                game_ids[position] = game_id
+
+    return {"game_ids": game_ids, **bulk.error_report(errors)}
@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
 from src import database as db
 import sqlalchemy
 from bcrypt import gensalt, hashpw, checkpw
@@ -25,7 +26,7 @@ def check_password(entered_password, hashed_password):
 
 
 @router.post("/adduser/", tags=["login"])
-def add_user(userinfo: UserInfo):
+async def add_user(userinfo: UserInfo):
     """
     This endpoint registers a new user, with a given username and password
     * `userinfo` is a class w/ two string attributes: username and password 
@@ -33,8 +34,10 @@ def add_user(userinfo: UserInfo):
     Returns the id of the new user created 
     """
 
-    with db.engine.begin() as conn:
-        inserted_user = conn.execute(
+    hashed_password = await run_in_threadpool(hash_and_salt_password, userinfo.password)
+
+    async with db.writer() as conn:
+        inserted_user = await conn.execute(
             sqlalchemy.text(
             """
                 INSERT INTO users (username, hashed_password)
@@ -44,14 +47,14 @@ def add_user(userinfo: UserInfo):
             ),
             {
                 "username": userinfo.username,
-                "password": hash_and_salt_password(userinfo.password)
+                "password": hashed_password
             }
         )
         user = inserted_user.scalar_one()
     return user
 
 @router.post("/loginuser/", tags=["login"])
-def user_login(userinfo: UserInfo):
+async def user_login(userinfo: UserInfo):
     """
     This endpoint checks that a user's entered username and password 
     match what is stored in the database
@@ -62,8 +65,8 @@ def user_login(userinfo: UserInfo):
     Returns a string for if the user login was successful 
     """
 
-    with db.engine.begin() as conn:
-        hashed_password = conn.execute(
+    async with db.reader() as conn:
+        hashed_password = (await conn.execute(
             sqlalchemy.text(
             """
                 SELECT hashed_password
@@ -71,7 +74,7 @@ def user_login(userinfo: UserInfo):
                 WHERE username = :username
             """
             ), {"username": userinfo.username}
-        ).scalar_one()
-    # check the password matches 
-    return check_password(userinfo.password, hashed_password)
+        )).scalar_one()
+    # check the password matches (bcrypt is slow on purpose, keep it off the event loop)
+    return await run_in_threadpool(check_password, userinfo.password, hashed_password)
 
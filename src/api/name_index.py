@@ -0,0 +1,135 @@
+"""
+In-process prefix indexes of athlete and team names, for autocomplete without a database round trip.
+
+Each index keeps the normalized names in sorted order, split into chunks of about CHUNK_SIZE,
+so the names starting with a prefix are two bisects away and adding a name only shifts one chunk. Every word of a name is indexed, so "jam" finds "LeBron James" as well as
+"James Harden". The indexes load from the database on first use (or in the background at
+startup) and are kept current by this process's writes.
+"""
+import bisect
+import unicodedata
+
+import sqlalchemy
+
+from src import database as db
+
+CHUNK_SIZE = 1000
+
+
+def normalize(name):
+    """Lowercase, without accents and with single spaces, so "Nikola Jokić" matches "nikola jok"."""
+    name = unicodedata.normalize("NFKD", name)
+    return " ".join("".join(char for char in name if not unicodedata.combining(char)).lower().split())
+
+
+class NameIndex:
+    def __init__(self, table, id_column, name_column):
+        self._table = table
+        self._id_column = id_column
+        self._name_column = name_column
+        self.names = {}  # id -> display name
+        # normalized names and name suffixes starting at a word, sorted and split into chunks of at most
+        # 2 * CHUNK_SIZE, with the id of each entry in a parallel chunk and the last key of every chunk
+        self._key_chunks = []
+        self._id_chunks = []
+        self._maxes = []
+        self._loaded = False
+        self._pending = []
+
+    def __contains__(self, id):
+        return id in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    async def load(self):
+        """Reads every name from the database, unless the index is already loaded."""
+        if self._loaded:
+            return
+        stmt = sqlalchemy.select(self._table.c[self._id_column], self._table.c[self._name_column])
+        async with db.reader() as conn:
+            rows = (await conn.execute(stmt)).fetchall()
+        if not self._loaded:
+            self.build(rows)
+
+    def build(self, rows):
+        """Replaces the index with the given (id, name) pairs."""
+        self.names = {}
+        entries = []
+        for id, name in rows:
+            self.names[id] = name
+            entries.extend((key, id) for key in self._index_keys(name))
+        entries.sort()
+        keys = [key for key, _ in entries]
+        ids = [id for _, id in entries]
+        self._key_chunks = [keys[start:start + CHUNK_SIZE] for start in range(0, len(keys), CHUNK_SIZE)]
+        self._id_chunks = [ids[start:start + CHUNK_SIZE] for start in range(0, len(ids), CHUNK_SIZE)]
+        self._maxes = [chunk[-1] for chunk in self._key_chunks]
+        self._loaded = True
+
+        # names added while the rows were being read may be missing from them
+        pending, self._pending = self._pending, []
+        for id, name in pending:
+            self.add(id, name)
+
+    def add(self, id, name):
+        """Adds a name written by this process. Before the index is loaded it is kept aside until then."""
+        if not self._loaded:
+            self._pending.append((id, name))
+            return
+        if id in self.names:
+            return
+        self.names[id] = name
+        for key in self._index_keys(name):
+            self._insert(key, id)
+
+    def _insert(self, key, id):
+        if not self._key_chunks:
+            self._key_chunks, self._id_chunks, self._maxes = [[key]], [[id]], [key]
+            return
+        # the first chunk ending past `key`, so the entry goes after every equal key, as in one flat list
+        chunk = min(bisect.bisect_right(self._maxes, key), len(self._maxes) - 1)
+        keys, ids = self._key_chunks[chunk], self._id_chunks[chunk]
+        position = bisect.bisect_right(keys, key)
+        keys.insert(position, key)
+        ids.insert(position, id)
+        self._maxes[chunk] = keys[-1]
+        if len(keys) > 2 * CHUNK_SIZE:
+            self._key_chunks[chunk:chunk + 1] = [keys[:CHUNK_SIZE], keys[CHUNK_SIZE:]]
+            self._id_chunks[chunk:chunk + 1] = [ids[:CHUNK_SIZE], ids[CHUNK_SIZE:]]
+            self._maxes[chunk:chunk + 1] = [keys[CHUNK_SIZE - 1], keys[-1]]
+
+    def prefix(self, query, k):
+        """Up to `k` (id, name) pairs with a word starting with `query`, ordered by the matched text."""
+        query = normalize(query)
+        matches = {}
+        chunk = bisect.bisect_left(self._maxes, query)
+        position = bisect.bisect_left(self._key_chunks[chunk], query) if chunk < len(self._maxes) else 0
+        while chunk < len(self._key_chunks):
+            keys, ids = self._key_chunks[chunk], self._id_chunks[chunk]
+            while position < len(keys):
+                if len(matches) >= k or not keys[position].startswith(query):
+                    return list(matches.items())
+                matches.setdefault(ids[position], self.names[ids[position]])
+                position += 1
+            chunk += 1
+            position = 0
+        return list(matches.items())
+
+    @staticmethod
+    def _index_keys(name):
+        words = normalize(name).split(" ")
+        return {" ".join(words[i:]) for i in range(len(words))}
+
+
+athlete_names = NameIndex(db.athletes, "athlete_id", "name")
+team_names = NameIndex(db.teams, "team_id", "team_name")
+
+
+async def load_all():
+    await athlete_names.load()
+    await team_names.load()
@@ -0,0 +1,64 @@
+import base64
+import json
+from enum import Enum
+
+import sqlalchemy
+from fastapi import HTTPException
+
+
+class PaginationModes(str, Enum):
+    offset = "offset"
+    keyset = "keyset"
+
+
+def encode_cursor(*key):
+    """Opaque cursor for the row with the given key values, to resume after it. Dates are stored as ISO strings."""
+    return base64.urlsafe_b64encode(json.dumps(key, default=lambda value: value.isoformat()).encode()
+                                    ).decode().rstrip("=")
+
+
+def decode_cursor(cursor, *types):
+    """
+    The key values stored in a cursor, which must be of the given types (or ISO strings of them, for dates).
+    Raises a 400 if the cursor wasn't made by encode_cursor.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor.")
+    if not isinstance(key, list) or len(key) != len(types):
+        raise HTTPException(status_code=400, detail="invalid cursor.")
+    try:
+        return [value if type(value) is key_type else key_type.fromisoformat(value)
+                for value, key_type in zip(key, types)]
+    except (AttributeError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="invalid cursor.")
+
+
+def keyset_page(stmt, key_column, limit, cursor=None):
+    """
+    Restricts `stmt` to the page after `cursor`, ordered by `key_column`, or by a tuple of
+    columns that together are unique. One row more than `limit` is fetched, so next_page
+    can tell whether another page follows.
+
+    With a tuple, the leading column is also bounded on its own: Postgres can't turn a row
+    comparison into an index condition for every index type (BRIN in particular), but it can use that.
+    """
+    key_columns = key_column if isinstance(key_column, tuple) else (key_column,)
+    if cursor is not None:
+        key = decode_cursor(cursor, *[column.type.python_type for column in key_columns])
+        if len(key_columns) == 1:
+            stmt = stmt.where(key_column > key[0])
+        else:
+            stmt = stmt.where(key_columns[0] >= key[0],
+                              sqlalchemy.tuple_(*key_columns) > sqlalchemy.tuple_(*key))
+    return stmt.order_by(*key_columns).limit(limit + 1)
+
+
+def next_page(rows, limit, key):
+    """The first `limit` rows, and the cursor for the next page or None if this is the last one."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    key = key(rows[-1])
+    return rows, encode_cursor(*key) if isinstance(key, tuple) else encode_cursor(key)
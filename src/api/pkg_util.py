@@ -2,6 +2,7 @@ from fastapi import APIRouter
 import os
 import pkg_resources
 import sys
+from src import database as db
 
 router = APIRouter()
 
@@ -44,3 +45,11 @@ def get_pkgsize():
 
     message = sorted(message, key=lambda d: d["size_in_mb"], reverse=True)
     return {"message": message}
+
+
+@router.get("/poolstatus/")
+async def get_pool_status():
+    """
+    Connection pool occupancy and how long requests have waited to check out a connection.
+    """
+    return db.pool_status()
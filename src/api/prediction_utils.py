@@ -26,6 +26,12 @@ def normalize_predictions(predictions, max_values):
             norm_predictions[key] = 0
     return norm_predictions
 
+def mean_rating_of(ratings):
+    """Mean of a rating totals row (rating_sum, rating_count), or 3 for an entity nobody has rated."""
+    if ratings is None or ratings.rating_count == 0:
+        return 3  # Average
+    return ratings.rating_sum / ratings.rating_count
+
 def calculate_mp(weights, norm_predictions, mean_rating):
     weighted_sum = sum(norm_predictions[prediction] * weights[prediction] for prediction in norm_predictions)
     market_price = pow(1 + weighted_sum, mean_rating)
@@ -44,9 +50,7 @@ def calc_team_market_price(team_stats_json, ratings):
 
     norm_predictions = normalize_predictions(predictions, max_values)
 
-    ratings_sum = sum(ratings)
-    ratings_count = len(ratings)
-    mean_rating = ratings_sum / ratings_count if ratings_count > 0 else 3  # Average
+    mean_rating = mean_rating_of(ratings)
 
     # Output
     weights = {
@@ -78,11 +82,7 @@ def calc_athlete_market_price(athlete_stats_json, ratings, result):
 
     norm_predictions = normalize_predictions(predictions, max_values)
 
-    ratings = [rating_instance.rating for rating_instance in ratings]
-
-    ratings_sum = sum(ratings)
-    ratings_count = len(ratings)
-    mean_rating = ratings_sum / ratings_count if ratings_count > 0 else 3 
+    mean_rating = mean_rating_of(ratings)
 
     weights = {
         'games_played': 0.2,
@@ -0,0 +1,210 @@
+"""
+Opt-in write-behind buffering for POST /teamratings/ and /athleteratings/, for rating bursts
+the database can't take one transaction at a time.
+
+With RATING_BUFFER set, a rating is checked against the in-memory name indexes instead of the
+database and queued; a background task writes the queue in multi-row batches, each one a
+single transaction inserting the ratings and adding them to the rating totals. Settings:
+* `RATING_BUFFER`: `enqueue` to answer as soon as the rating is queued, `flush` to answer once
+  its batch is committed. Unset (the default) writes every rating in its own transaction.
+* `RATING_BUFFER_FLUSH_MS`: longest a rating waits for its batch to fill (default 50)
+* `RATING_BUFFER_BATCH_ROWS`: ratings per batch (default 1000)
+* `RATING_BUFFER_MAX_SIZE`: ratings the queue holds; when it is full requests wait for room (default 10000)
+
+In `enqueue` mode a rating that was answered is lost if the process dies before its batch is
+written, or if the batch fails; `flush` mode answers those requests with a 503 instead.
+Ids that aren't in the name indexes (or before they have loaded), and ratings arriving once the
+buffer is stopping, are left to the unbuffered path, which looks them up in the database.
+"""
+import asyncio
+import contextlib
+import logging
+import os
+
+import sqlalchemy
+from fastapi import HTTPException
+
+from src import database as db
+from src import rollups
+from src.api import name_index
+
+logger = logging.getLogger(__name__)
+
+ACK_MODES = ("enqueue", "flush")
+
+# kind -> (raw ratings, rating totals name in rollups, name index)
+KINDS = {
+    "team": (db.team_ratings, "team_rating_stats", name_index.team_names),
+    "athlete": (db.athlete_ratings, "athlete_rating_stats", name_index.athlete_names),
+}
+
+
+def _insert_ratings(ratings, id_column):
+    return ratings.insert().from_select([id_column, "rating"], sqlalchemy.select(rollups.new_ratings(id_column)))
+
+
+_insert_many = {kind: _insert_ratings(ratings, rollups.RATING_STATS[name][2])
+                for kind, (ratings, name, _) in KINDS.items()}
+
+
+class RatingBuffer:
+    def __init__(self, ack_after_flush=False, flush_interval=0.05, batch_rows=1000, max_size=10000):
+        self.ack_after_flush = ack_after_flush
+        self.flush_interval = flush_interval
+        self.batch_rows = batch_rows
+        self.max_size = max_size
+        self.written = 0
+        self.dropped = 0
+        self.closed = False
+        self._putting = 0      # add() calls waiting for room in the queue
+        self._queue = None
+        self._task = None
+        self._getter = None    # a pending queue.get() carried over from the last batch
+        self._batch = []       # ratings taken off the queue and not yet handed to a flush
+        self._flushing = None
+
+    @classmethod
+    def from_environ(cls):
+        """The buffer configured by the RATING_BUFFER variables, or None when buffering is off."""
+        mode = os.environ.get("RATING_BUFFER", "").lower()
+        if not mode:
+            return None
+        if mode not in ACK_MODES:
+            raise ValueError(f"RATING_BUFFER must be one of {', '.join(ACK_MODES)}, not {mode!r}")
+        return cls(
+            ack_after_flush=mode == "flush",
+            flush_interval=int(os.environ.get("RATING_BUFFER_FLUSH_MS", 50)) / 1000,
+            batch_rows=int(os.environ.get("RATING_BUFFER_BATCH_ROWS", 1000)),
+            max_size=int(os.environ.get("RATING_BUFFER_MAX_SIZE", 10000)),
+        )
+
+    async def start(self):
+        self._queue = asyncio.Queue(self.max_size)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stops the background task and writes everything still queued."""
+        self.closed = True
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        if self._flushing is not None:
+            await self._flushing
+        # cancelling the task may have cancelled a queue.get() it was waiting on, which leaves its rating queued
+        if self._getter is not None:
+            if self._getter.done() and not self._getter.cancelled():
+                self._batch.append(self._getter.result())
+            else:
+                self._getter.cancel()
+        # every rating taken off a full queue lets a waiting add() put its own, so keep going until none are left
+        while True:
+            while not self._queue.empty():
+                self._batch.append(self._queue.get_nowait())
+            if not self._putting:
+                break
+            await asyncio.sleep(0)
+        batch, self._batch = self._batch, []
+        for start in range(0, len(batch), self.batch_rows):
+            await self._flush(batch[start:start + self.batch_rows])
+
+    async def add(self, kind, id, rating):
+        """
+        Queues a rating and returns the name of the rated team or athlete, or None when the id
+        isn't in the name index or the buffer is stopping, for the caller to handle unbuffered.
+        """
+        index = KINDS[kind][2]
+        if self.closed or not index.loaded or id not in index:
+            return None
+        done = asyncio.get_running_loop().create_future() if self.ack_after_flush else None
+        self._putting += 1
+        try:
+            await self._queue.put((kind, id, rating, done))
+        finally:
+            self._putting -= 1
+        if done is not None:
+            await done
+        return index.names[id]
+
+    async def _run(self):
+        while True:
+            await self._collect()
+            batch, self._batch = self._batch, []
+            # shielded so stopping doesn't cut a write short
+            self._flushing = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._flushing)
+            self._flushing = None
+
+    async def _collect(self):
+        """Fills the batch up to batch_rows, waiting at most flush_interval after its first rating."""
+        loop = asyncio.get_running_loop()
+        if self._getter is None:
+            self._getter = loop.create_task(self._queue.get())
+        self._batch.append(await self._getter)
+        self._getter = None
+        deadline = loop.time() + self.flush_interval
+
+        while len(self._batch) < self.batch_rows:
+            try:
+                self._batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            # waited on as a task rather than with wait_for, so a timeout never loses a rating
+            self._getter = loop.create_task(self._queue.get())
+            await asyncio.wait({self._getter}, timeout=remaining)
+            if not self._getter.done():
+                return
+            self._batch.append(self._getter.result())
+            self._getter = None
+
+    async def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            async with db.writer(isolation_level="READ COMMITTED") as conn:
+                for kind in KINDS:
+                    ids = [id for rating_kind, id, _, _ in batch if rating_kind == kind]
+                    if not ids:
+                        continue
+                    ratings = [rating for rating_kind, _, rating, _ in batch if rating_kind == kind]
+                    await conn.execute(_insert_many[kind], {"ids": ids, "ratings": ratings})
+                    await rollups.update_rating_stats_many(conn, KINDS[kind][1], ids, ratings)
+        except Exception:
+            self.dropped += len(batch)
+            logger.exception("failed to write %d buffered ratings", len(batch))
+            for _, _, _, done in batch:
+                if done is not None and not done.done():
+                    done.set_exception(HTTPException(status_code=503, detail="rating could not be saved."))
+            return
+        self.written += len(batch)
+        for _, _, _, done in batch:
+            if done is not None and not done.done():
+                done.set_result(None)
+
+
+buffer = None
+
+
+async def start():
+    """Starts buffering if RATING_BUFFER is set."""
+    global buffer
+    buffer = RatingBuffer.from_environ()
+    if buffer is not None:
+        await buffer.start()
+
+
+async def stop():
+    global buffer
+    if buffer is not None:
+        running, buffer = buffer, None
+        await running.stop()
+
+
+async def add(kind, id, rating):
+    """Buffers a rating when buffering is on; returns the rated name, or None if it must be written directly."""
+    if buffer is None:
+        return None
+    return await buffer.add(kind, id, rating)
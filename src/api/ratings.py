@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException
 import sqlalchemy
 from src import database as db
+from src import rollups
+from src.api import rating_buffer
 from pydantic import BaseModel, conint
 
 router = APIRouter()
@@ -12,7 +14,7 @@ class Rating(BaseModel):
 
 
 @router.post("/teamratings/", tags=["ratings"])
-def add_team_rating(rat: Rating):
+async def add_team_rating(rat: Rating):
     """
     This endpoint adds a user-generated team rating to the team_ratings table 
     * `rating`: contains the team id (int) and rating (as a number 1 through 5) of the team
@@ -20,16 +22,22 @@ def add_team_rating(rat: Rating):
     The endpoint returns the name of the rated team
     """
 
+    team_name = await rating_buffer.add("team", rat.id, rat.rating)
+    if team_name is not None:
+        return team_name
+
     team_name_stmt = sqlalchemy.select(db.teams.c.team_name).where(db.teams.c.team_id == rat.id)
 
-    with db.engine.begin() as conn:
+    # the totals upsert is a single atomic increment, so concurrent ratings of a
+    # team just queue on its row rather than failing serialization
+    async with db.writer(isolation_level="READ COMMITTED") as conn:
 
-        team_name = conn.execute(team_name_stmt).fetchone()
+        team_name = (await conn.execute(team_name_stmt)).fetchone()
 
         if not team_name:
             raise HTTPException(status_code=404, detail="team not found.")
 
-        conn.execute(
+        await conn.execute(
             sqlalchemy.text(
                 """
                 INSERT INTO team_ratings (team_id, rating)
@@ -41,12 +49,13 @@ def add_team_rating(rat: Rating):
                 "rating": rat.rating
             }
         )
+        await rollups.update_team_rating_stats(conn, rat.id, rat.rating)
 
     return team_name.team_name
 
 
 @router.post("/athleteratings/", tags=["ratings"])
-def add_athlete_rating(rat: Rating):
+async def add_athlete_rating(rat: Rating):
     """
     This endpoint adds a user-generated athlete rating to the athlete_ratings table
     * `rating`: contains the athlete id (int) and rating (as a number 1 through 5) of the athlete
@@ -54,15 +63,19 @@ def add_athlete_rating(rat: Rating):
     The endpoint returns the name of the rated athlete
     """
 
+    athlete_name = await rating_buffer.add("athlete", rat.id, rat.rating)
+    if athlete_name is not None:
+        return athlete_name
+
     athlete_name_stmt = sqlalchemy.select(db.athletes.c.name).where(db.athletes.c.athlete_id == rat.id)
 
-    with db.engine.begin() as conn:
-        athlete_name = conn.execute(athlete_name_stmt).fetchone()
+    async with db.writer(isolation_level="READ COMMITTED") as conn:
+        athlete_name = (await conn.execute(athlete_name_stmt)).fetchone()
 
         if not athlete_name:
             raise HTTPException(status_code=404, detail="athlete not found.")
 
-        conn.execute(
+        await conn.execute(
             sqlalchemy.text(
                 """
                 INSERT INTO athlete_ratings (athlete_id, rating)
@@ -74,5 +87,6 @@ def add_athlete_rating(rat: Rating):
                 "rating": rat.rating
             }
         )
+        await rollups.update_athlete_rating_stats(conn, rat.id, rat.rating)
 
     return athlete_name.name
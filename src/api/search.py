@@ -0,0 +1,17 @@
+from enum import Enum
+
+import sqlalchemy
+
+
+class SearchModes(str, Enum):
+    substring = "substring"
+    fuzzy = "fuzzy"
+
+
+def fuzzy_match(column, name):
+    """
+    Filter and score for a typo-tolerant search of `column` for `name`.
+    `%` keeps rows whose trigram similarity to `name` reaches pg_trgm.similarity_threshold
+    (0.3 by default) and is answered from the column's gin_trgm_ops index.
+    """
+    return column.op("%")(name), sqlalchemy.func.similarity(column, name)
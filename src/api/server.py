@@ -1,5 +1,8 @@
-from fastapi import FastAPI
-from src.api import athletes, games, teams, pkg_util, ratings, login, predictions
+from fastapi import FastAPI, Request
+import asyncio
+import os
+from src import database as db
+from src.api import athletes, games, teams, pkg_util, ratings, login, predictions, name_index, export, rating_buffer
 
 description = """
 Get all the information and analytical insight 
@@ -26,6 +29,10 @@ tags_metadata = [
     {
         "name": "predictions",
         "description": "Get market values for athletes and teams.",
+    },
+    {
+        "name": "export",
+        "description": "Download whole tables for analysis.",
     }
 ]
 
@@ -47,6 +54,50 @@ app.include_router(pkg_util.router)
 app.include_router(ratings.router)
 app.include_router(login.router)
 app.include_router(predictions.router)
+app.include_router(export.router)
+
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """
+    After a successful write the client gets a short-lived cookie that keeps its reads
+    on the primary until the replica has caught up. Clients can also ask for this
+    explicitly with the `X-Read-Your-Writes` header.
+    """
+    if request.cookies.get("read_your_writes") or request.headers.get("X-Read-Your-Writes"):
+        db.pin_to_primary()
+
+    response = await call_next(request)
+
+    if request.method != "GET" and response.status_code < 400 and db.get_async_replica_engine() is not None:
+        response.set_cookie("read_your_writes", "1", max_age=int(os.environ.get("DB_REPLICA_PIN_SECONDS", 5)))
+    return response
+
+
+@app.on_event("startup")
+async def verify_database_schema():
+    # opt-in, since it costs a round trip per table on every cold start
+    if os.environ.get("VERIFY_DB_SCHEMA", "").lower() in ("1", "true", "yes"):
+        await db.verify_schema()
+
+
+@app.on_event("startup")
+async def load_name_indexes():
+    # loaded in the background so startup isn't held up; autocomplete requests load on demand until then
+    app.state.name_indexes = asyncio.get_running_loop().create_task(name_index.load_all())
+
+
+@app.on_event("startup")
+async def start_rating_buffer():
+    # opt-in with RATING_BUFFER (see src/api/rating_buffer.py)
+    await rating_buffer.start()
+
+
+@app.on_event("shutdown")
+async def stop_rating_buffer():
+    # writes whatever is still queued before the process exits
+    await rating_buffer.stop()
+
 
 @app.get("/")
 async def root():
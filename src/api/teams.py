@@ -1,52 +1,42 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from enum import Enum
+import hashlib
+import json as jsonlib
+import os
+from typing import List
 import sqlalchemy
 from src import database as db
-from sqlalchemy import extract
+from src.api import name_index
+from src.api.pagination import PaginationModes, keyset_page, next_page
+from src.api.search import SearchModes, fuzzy_match
 from fastapi.params import Query
 
 router = APIRouter()
 
 
-def get_team_helper(conn, team_id, year):
-    games = sqlalchemy.select(db.games.c.home,
-                              db.games.c.away,
-                              db.games.c.pts_home,
-                              db.games.c.pts_away).where((
-                                                                 (db.games.c.home == team_id) |
-                                                                 (db.games.c.away == team_id)) & (
-                                                                 ((extract("year", db.games.c.date) == year) &
-                                                                  (extract("month", db.games.c.date) < 10)) |
-                                                                 ((extract("year", db.games.c.date) == year - 1) &
-                                                                  (extract("month", db.games.c.date) >= 10))))
-
-    games_table = conn.execute(games).fetchall()
-
-    wins = points_for = points_allowed = losses = 0
-
-    for row in games_table:
-        winner = row.home if row.pts_home > row.pts_away else row.away
-        if winner == team_id:
-            wins += 1
-        else:
-            losses += 1
-        if team_id == row.home:
-            points_for += row.pts_home
-            points_allowed += row.pts_away
-        elif team_id == row.away:
-            points_for += row.pts_away
-            points_allowed += row.pts_home
-
-    games_played = wins + losses
-    stats = {"season": year, "wins": wins, "losses": losses,
-             "average points for": round((points_for / games_played), 2),
-             "average points allowed": round((points_allowed / games_played), 2)}
+async def get_team_helper(conn, team_id, seasons):
+    """
+    Wins, losses and average points for and against in each of the given seasons,
+    read from the team_season_stats rollup. Seasons without games are left out.
+    """
+    rows = await conn.execute(
+        sqlalchemy.select(db.team_season_stats)
+            .where((db.team_season_stats.c.team_id == team_id) & db.team_season_stats.c.season.in_(seasons))
+            .order_by(db.team_season_stats.c.season)
+    )
+
+    stats = []
+    for row in rows:
+        games_played = row.wins + row.losses
+        stats.append({"season": row.season, "wins": row.wins, "losses": row.losses,
+                      "average points for": round((row.points_for / games_played), 2),
+                      "average points allowed": round((row.points_allowed / games_played), 2)})
 
     return stats
 
 
 @router.get("/teams/{team_id}", tags=["teams"])
-def get_team(team_id: int,
+async def get_team(team_id: int,
              year: int = None
              ):
     """
@@ -65,23 +55,16 @@ def get_team(team_id: int,
     team = sqlalchemy.select(db.teams.c.team_id, db.teams.c.team_name, db.teams.c.team_abbrev).where(
         db.teams.c.team_id == team_id)
 
-    with db.engine.begin() as conn:
-        result = conn.execute(team).fetchone()
+    async with db.reader() as conn:
+        result = (await conn.execute(team)).fetchone()
 
         if result is None:
             raise HTTPException(status_code=404, detail="team not found")
 
         team_name = result.team_name
 
-        if year:
-            stats = [get_team_helper(conn, team_id, year)]
-        else:
-            stats1 = get_team_helper(conn, team_id, 2019)
-            stats2 = get_team_helper(conn, team_id, 2020)
-            stats3 = get_team_helper(conn, team_id, 2021)
-            stats4 = get_team_helper(conn, team_id, 2022)
-            stats5 = get_team_helper(conn, team_id, 2023)
-            stats = [stats1, stats2, stats3, stats4, stats5]
+        seasons = [year] if year else list(range(2019, 2024))
+        stats = await get_team_helper(conn, team_id, seasons)
 
         json = {"team_id": team_id, "team_name": team_name, "team_stats": stats}
 
@@ -97,68 +80,166 @@ class stat_options(str, Enum):
 
 
 @router.get("/teams/compare_teams/", tags=["teams"])
-def compare_team(team_1: int,
-                 team_2: int,
-                 team_3: int = None,
-                 team_4: int = None,
-                 team_5: int = None,
-                 compare_by: stat_options = stat_options.points):
+async def compare_team(team_ids: List[int] = Query([]),
+                       compare_by: List[stat_options] = Query([stat_options.points]),
+                       since_season: int = None,
+                       until_season: int = None,
+                       team_1: int = None,
+                       team_2: int = None,
+                       team_3: int = None,
+                       team_4: int = None,
+                       team_5: int = None):
     """
-    This endpoint compares between up to 5 teams by a single metric
-    * `team_i`: the id of a team to be compared
-    * `Compare_by` must be one of the following values
+    This endpoint compares any number of teams by their per game averages
+    * `team_ids`: the ids of the teams to be compared (repeat the parameter, e.g.
+      `team_ids=1&team_ids=2`). `team_1` to `team_5` are still accepted as well.
+    * `compare_by`: one or more of the following values, the teams are sorted by the first one
         * `points`: The average points per game
         * `rebounds`: The average rebounds per game
         * `assists`: The average assists per game
         * `steals`: The average steals per game
         * `blocks`: The average blocks per game
-    """
-    num_ssn_games = 82
+    * `since_season`, `until_season`: only count games from this range of seasons (inclusive)
 
-    teams_to_compare = (
-        sqlalchemy.select(db.teams.c.team_id, db.teams.c.team_name)
-            .where(sqlalchemy.column('team_id').in_([team_1, team_2, team_3, team_4, team_5]))
-    )
-
-    mapper = {"points": "pts", "rebounds": "reb", "assists": "ast", "steals": "stl", "blocks": "blk"}
-    games_query = (
+    For each team it returns its `team_id`, `team_name`, the number of `games_played`
+    in the range and the average of every requested stat. Teams without any games
+    in the range have null averages and are listed last.
+    """
+    team_ids = list(dict.fromkeys(team_ids + [team for team in (team_1, team_2, team_3, team_4, team_5)
+                                              if team is not None]))
+    if len(team_ids) < 2:
+        raise HTTPException(status_code=400, detail="please enter at least two teams to compare")
+    if since_season is not None and until_season is not None and since_season > until_season:
+        raise HTTPException(status_code=400, detail="since_season must not be after until_season")
+    compare_by = list(dict.fromkeys(compare_by))
+
+    season_filter = [db.team_season_stats.c.team_id == db.teams.c.team_id]
+    if since_season is not None:
+        season_filter.append(db.team_season_stats.c.season >= since_season)
+    if until_season is not None:
+        season_filter.append(db.team_season_stats.c.season <= until_season)
+
+    mapper = {"points": "points_for", "rebounds": "rebounds", "assists": "assists", "steals": "steals",
+              "blocks": "blocks"}
+    stmt = (
         sqlalchemy.select(
             db.teams.c.team_id,
             db.teams.c.team_name,
-            sqlalchemy.func.sum(
-                sqlalchemy.case(
-                    (db.games.c.home == db.teams.c.team_id, getattr(db.games.c, mapper[compare_by.value] + "_home")),
-                    else_=getattr(db.games.c, mapper[compare_by.value] + "_away")
-                )
-            ).label(compare_by.value)
+            sqlalchemy.func.coalesce(
+                sqlalchemy.func.sum(db.team_season_stats.c.wins + db.team_season_stats.c.losses), 0
+            ).label("games_played"),
+            *[sqlalchemy.func.sum(db.team_season_stats.c[mapper[stat.value]]).label(stat.value)
+              for stat in compare_by]
         )
-            .select_from(db.teams.join(db.games, sqlalchemy.or_(db.teams.c.team_id == db.games.c.home,
-                                                                db.teams.c.team_id == db.games.c.away)))
-            .where(sqlalchemy.column('team_id').in_([team_1, team_2, team_3, team_4, team_5]))
+            .select_from(db.teams.outerjoin(db.team_season_stats, sqlalchemy.and_(*season_filter)))
+            .where(db.teams.c.team_id.in_(team_ids))
             .group_by(db.teams.c.team_id, db.teams.c.team_name)
     )
 
-    with db.engine.begin() as conn:
-        result = conn.execute(teams_to_compare).fetchall()
-        teams_data = {row.team_id: {'team_name': row.team_name} for row in result}
+    async with db.reader() as conn:
+        result = (await conn.execute(stmt)).fetchall()
 
-        games_result = conn.execute(games_query).fetchall()
-        for row in games_result:
-            team_id = row.team_id
-            teams_data[team_id][str(compare_by.value)] = round(
-                getattr(row, compare_by.value) / (num_ssn_games * 5), 3)
+    teams_data = []
+    for row in result:
+        team = {"team_id": row.team_id, "team_name": row.team_name, "games_played": row.games_played}
+        for stat in compare_by:
+            total = getattr(row, stat.value)
+            team[stat.value] = round(total / row.games_played, 3) if row.games_played else None
+        teams_data.append(team)
 
-        sorted_teams = sorted(teams_data.values(), key=lambda x: -x[compare_by.value])
-        return sorted_teams
+    first = compare_by[0].value
+    return sorted(teams_data, key=lambda x: (x[first] is None, -(x[first] or 0), x["team_id"]))
+
+
+STANDINGS_MAX_AGE = int(os.environ.get("STANDINGS_MAX_AGE", 60))
+
+
+@router.get("/teams/standings/", tags=["teams"])
+async def get_standings(request: Request,
+                        response: Response,
+                        season: List[int] = Query([])):
+    """
+    This endpoint returns the league standings for one or more seasons (every season
+    by default). For each season it returns every team with games in it, ranked by win
+    percentage:
+    * `rank`: The team's place in the season. Teams with the same win percentage share a rank
+    * `team_id`: The internal id of the team
+    * `team_name`: The name of the team
+    * `wins`: Number of games the team won
+    * `losses`: Number of games the team lost
+    * `win_pct`: The share of its games the team won
+    * `point_differential`: Points scored minus points allowed
+
+    Responses carry a `Cache-Control` header and an `ETag`, so clients and proxies can
+    cache the standings of each season and revalidate them cheaply.
+    """
+    stats = db.team_season_stats.c
+    win_pct = sqlalchemy.cast(stats.wins, sqlalchemy.Float) / (stats.wins + stats.losses)
+    stmt = (
+        sqlalchemy.select(
+            stats.season,
+            sqlalchemy.func.rank().over(partition_by=stats.season, order_by=win_pct.desc()).label("rank"),
+            stats.team_id,
+            db.teams.c.team_name,
+            stats.wins,
+            stats.losses,
+            win_pct.label("win_pct"),
+            (stats.points_for - stats.points_allowed).label("point_differential")
+        )
+            .join(db.teams, db.teams.c.team_id == stats.team_id)
+            .order_by(stats.season, sqlalchemy.text("rank"), stats.team_id)
+    )
+    if season:
+        stmt = stmt.where(stats.season.in_(season))
+
+    async with db.reader() as conn:
+        result = (await conn.execute(stmt)).fetchall()
+
+    standings = {}
+    for row in result:
+        standings.setdefault(row.season, []).append({
+            "rank": row.rank,
+            "team_id": row.team_id,
+            "team_name": row.team_name,
+            "wins": row.wins,
+            "losses": row.losses,
+            "win_pct": round(row.win_pct, 3),
+            "point_differential": row.point_differential
+        })
+    json = [{"season": season, "standings": teams} for season, teams in standings.items()]
+
+    etag = '"' + hashlib.sha1(jsonlib.dumps(json).encode()).hexdigest() + '"'
+    headers = {"Cache-Control": f"public, max-age={STANDINGS_MAX_AGE}", "ETag": etag}
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return json
+
+
+@router.get("/teams/autocomplete/", tags=["teams"])
+async def autocomplete_teams(q: str = Query(..., min_length=1),
+                             k: int = Query(10, ge=1, le=30)):
+    """
+    This endpoint suggests teams for a partially typed name, without querying the database.
+    It returns up to `k` teams with a name or a word of their name starting with `q`
+    (ignoring case), so "cel" finds the Boston Celtics. For each team it returns:
+    * `team_id`: The internal id of the team
+    * `team_name`: The name of the team
+    """
+    await name_index.team_names.load()
+    return [{"team_id": team_id, "team_name": name} for team_id, name in name_index.team_names.prefix(q, k)]
 
 
 @router.get("/teams/", tags=["teams"])
-def list_team(name: str = "",
+async def list_team(name: str = "",
               limit: int = Query(30, ge=1, le=30),
-              offset: int = Query(0, ge=0)
+              offset: int = Query(0, ge=0),
+              pagination: PaginationModes = PaginationModes.offset,
+              cursor: str = None,
+              search: SearchModes = SearchModes.substring
               ):
     """
-    This endpoint returns a list of teams. For each team it returns:
+    This endpoint returns a list of teams, ordered by id. For each team it returns:
     * `team_id`: the internal id of the character. Can be used to query the
       `/teams/{team_id}` endpoint.
     * `team_name`: The name of the team.
@@ -167,10 +248,17 @@ def list_team(name: str = "",
     You can filter for teams whose name contains a string by using the
     `name` query parameter.
 
-    The `limit` and `offset` query
-    parameters are used for pagination. The `limit` query parameter specifies the
-    maximum number of results to return. The `offset` query parameter specifies the
+    The `limit` query parameter specifies the maximum number of results to return.
+    With the default `pagination=offset`, the `offset` query parameter specifies the
     number of results to skip before returning results.
+
+    With `pagination=keyset` the endpoint returns `{"results": [...], "next_cursor": ...}`
+    instead. Pass `next_cursor` back as `cursor` to get the following page; it is null on
+    the last page.
+
+    By default `name` matches teams whose name contains it. With `search=fuzzy` the
+    endpoint instead returns the names most similar to `name`, best match first, each with
+    a similarity `score` between 0 and 1, so misspelled names are still found.
     """
 
     stmt = (
@@ -179,21 +267,43 @@ def list_team(name: str = "",
             db.teams.c.team_name,
             db.teams.c.team_abbrev,
         )
-            .limit(limit)
-            .offset(offset)
     )
 
+    keyset = pagination == PaginationModes.keyset or cursor is not None
+    fuzzy = search == SearchModes.fuzzy
+    if fuzzy:
+        if name == "":
+            raise HTTPException(status_code=400, detail="fuzzy search needs a name to search for.")
+        if keyset:
+            raise HTTPException(status_code=400, detail="fuzzy search results can only be paginated by offset.")
+        matches, score = fuzzy_match(db.teams.c.team_name, name)
+        stmt = stmt.add_columns(score.label("score")).where(matches).order_by(score.desc())
+
     # filter only if name parameter is passed
-    if name != "":
+    elif name != "":
         stmt = stmt.where(db.teams.c.team_name.ilike(f"%{name}%"))
 
-    with db.engine.connect() as conn:
-        result = conn.execute(stmt)
-        json = [{
-            "team_id": row.team_id,
-            "team_name": row.team_name,
-            "team_abbrev": row.team_abbrev
-        }
-            for row in result]
-
+    if keyset:
+        stmt = keyset_page(stmt, db.teams.c.team_id, limit, cursor)
+    else:
+        stmt = stmt.order_by(db.teams.c.team_id).limit(limit).offset(offset)
+
+    async with db.reader() as conn:
+        result = (await conn.execute(stmt)).fetchall()
+
+    if keyset:
+        result, next_cursor = next_page(result, limit, lambda row: row.team_id)
+
+    json = [{
+        "team_id": row.team_id,
+        "team_name": row.team_name,
+        "team_abbrev": row.team_abbrev
+    }
+        for row in result]
+    if fuzzy:
+        for team, row in zip(json, result):
+            team["score"] = round(row.score, 3)
+
+    if keyset:
+        return {"results": json, "next_cursor": next_cursor}
     return json
@@ -25,6 +25,9 @@ engine = sqlalchemy.create_engine(database_connection_url(), use_insertmanyvalue
 
 with engine.begin() as conn:
     conn.execute(sqlalchemy.text("""
+    DROP TABLE IF EXISTS team_season_stats;
+    DROP TABLE IF EXISTS team_rating_stats;
+    DROP TABLE IF EXISTS athlete_rating_stats;
     DROP TABLE IF EXISTS athlete_ratings;
     DROP TABLE IF EXISTS athlete_stats;
     DROP TABLE IF EXISTS athletes;
@@ -62,6 +65,10 @@ with engine.begin() as conn:
         home INT NOT NULL,
         away INT NOT NULL,
         date DATE NOT NULL,
+        season INT NOT NULL GENERATED ALWAYS AS (
+            CASE WHEN EXTRACT(MONTH FROM date) >= 10 THEN EXTRACT(YEAR FROM date)::int + 1
+                 ELSE EXTRACT(YEAR FROM date)::int END
+        ) STORED,
         pts_home INT NOT NULL,
         pts_away INT NOT NULL,
         reb_home INT NOT NULL,
@@ -76,6 +83,21 @@ with engine.begin() as conn:
         FOREIGN KEY (away) REFERENCES teams(team_id)
     );
 
+    CREATE TABLE team_season_stats (
+        team_id INT NOT NULL,
+        season INT NOT NULL,
+        wins INT NOT NULL,
+        losses INT NOT NULL,
+        points_for INT NOT NULL,
+        points_allowed INT NOT NULL,
+        rebounds INT NOT NULL,
+        assists INT NOT NULL,
+        steals INT NOT NULL,
+        blocks INT NOT NULL,
+        PRIMARY KEY (team_id, season),
+        FOREIGN KEY (team_id) REFERENCES teams(team_id)
+    );
+
     CREATE TABLE users (
         user_id serial PRIMARY KEY,
         username text NOT NULL,
@@ -95,6 +117,30 @@ with engine.begin() as conn:
         rating INT NOT NULL,
         FOREIGN KEY (athlete_id) REFERENCES athletes(athlete_id)
     );
+
+    CREATE TABLE team_rating_stats (
+        team_id INT PRIMARY KEY,
+        rating_sum INT NOT NULL,
+        rating_count INT NOT NULL,
+        rating_1 INT NOT NULL,
+        rating_2 INT NOT NULL,
+        rating_3 INT NOT NULL,
+        rating_4 INT NOT NULL,
+        rating_5 INT NOT NULL,
+        FOREIGN KEY (team_id) REFERENCES teams(team_id)
+    );
+
+    CREATE TABLE athlete_rating_stats (
+        athlete_id INT PRIMARY KEY,
+        rating_sum INT NOT NULL,
+        rating_count INT NOT NULL,
+        rating_1 INT NOT NULL,
+        rating_2 INT NOT NULL,
+        rating_3 INT NOT NULL,
+        rating_4 INT NOT NULL,
+        rating_5 INT NOT NULL,
+        FOREIGN KEY (athlete_id) REFERENCES athletes(athlete_id)
+    );
     """))
 print("Created tables")
 
@@ -144,6 +190,16 @@ with engine.begin() as conn:
         VALUES (:athlete_id, :year, :age, :team_id, :games_played, :minutes_played, :field_goal_percentage,
         :free_throw_percentage, :total_rebounds, :assists, :steals, :blocks, :turnovers, :points);
         """), athlete_stats)
+    conn.execute(sqlalchemy.text("""
+    CREATE INDEX ix_athletes_name ON athletes (name);
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX ix_athletes_name_trgm ON athletes USING gin (name gin_trgm_ops);
+    CREATE INDEX ix_athlete_stats_year ON athlete_stats (year);
+    """))
+    for stat in ["games_played", "minutes_played", "field_goal_percentage", "free_throw_percentage",
+                 "total_rebounds", "assists", "steals", "blocks", "turnovers", "points"]:
+        conn.execute(sqlalchemy.text(
+            f"CREATE INDEX ix_athlete_stats_year_{stat} ON athlete_stats (year, {stat} DESC, athlete_id);"))
     print("Completed athlete_stats")
 
     num_games = 100000
@@ -184,6 +240,15 @@ with engine.begin() as conn:
         VALUES (:game_id, :home, :away, :date, :pts_home, :pts_away, :reb_home, :reb_away, :ast_home, :ast_away,
         :stl_home, :stl_away, :blk_home, :blk_away);
         """), games)
+    conn.execute(sqlalchemy.text("""
+    CREATE INDEX ix_games_season ON games (season);
+    CREATE INDEX ix_games_home_away_date ON games (home, away, date);
+    CREATE INDEX ix_games_date_brin ON games USING brin (date);
+    CREATE INDEX ix_games_home_date ON games (home, date, game_id);
+    CREATE INDEX ix_games_away_date ON games (away, date, game_id);
+    SELECT setval(pg_get_serial_sequence('athletes', 'athlete_id'), (SELECT MAX(athlete_id) + 1 FROM athletes), false);
+    SELECT setval(pg_get_serial_sequence('games', 'game_id'), (SELECT MAX(game_id) + 1 FROM games), false);
+    """))
     print("Completed games")
 
     num_athlete_ratings = 150000
@@ -201,6 +266,7 @@ with engine.begin() as conn:
         INSERT INTO athlete_ratings (athlete_rating_id, athlete_id, rating)
         VALUES (:athlete_rating_id, :athlete_id, :rating);
         """), athlete_ratings)
+    conn.execute(sqlalchemy.text("CREATE INDEX ix_athlete_ratings_athlete_id ON athlete_ratings (athlete_id) INCLUDE (rating);"))
     print("Completed athlete_ratings")
 
     num_team_ratings = 150000
@@ -218,25 +284,74 @@ with engine.begin() as conn:
         INSERT INTO team_ratings (team_rating_id, team_id, rating)
         VALUES (:team_rating_id, :team_id, :rating);
         """), team_ratings)
+    conn.execute(sqlalchemy.text("CREATE INDEX ix_team_ratings_team_id ON team_ratings (team_id) INCLUDE (rating);"))
     print("Completed team_ratings")
 
 with engine.begin() as conn:
     conn.execute(
         sqlalchemy.text("""
-            DROP MATERIALIZED VIEW IF EXISTS max_athlete_stats;
-
-            CREATE MATERIALIZED VIEW max_athlete_stats AS
-                SELECT MAX(games_played) AS max_games_played, MAX(minutes_played) AS max_minutes_played, 
-                MAX(field_goal_percentage) AS max_field_goal_percentage, 
-                MAX(free_throw_percentage) AS max_free_throw_percentage, 
-                MAX(total_rebounds) AS max_total_rebounds, 
-                MAX(assists) AS max_assists, 
-                MAX(steals) AS max_steals, 
-                MAX(blocks) AS max_blocks, 
-                MAX(turnovers) AS max_turnovers, 
-                MAX(points) AS max_points
-        FROM athlete_stats;
+            DO $$ BEGIN
+                IF EXISTS (SELECT FROM pg_matviews WHERE matviewname = 'max_athlete_stats') THEN
+                    DROP MATERIALIZED VIEW max_athlete_stats;
+                END IF;
+            END $$;
+            DROP TABLE IF EXISTS max_athlete_stats;
+
+            CREATE TABLE max_athlete_stats (
+                max_games_played INT,
+                max_minutes_played INT,
+                max_field_goal_percentage FLOAT,
+                max_free_throw_percentage FLOAT,
+                max_total_rebounds INT,
+                max_assists INT,
+                max_steals INT,
+                max_blocks INT,
+                max_turnovers INT,
+                max_points INT
+            );
+            CREATE UNIQUE INDEX max_athlete_stats_one_row ON max_athlete_stats ((true));
+
+            INSERT INTO max_athlete_stats
+                SELECT MAX(games_played), MAX(minutes_played), MAX(field_goal_percentage),
+                MAX(free_throw_percentage), MAX(total_rebounds), MAX(assists), MAX(steals), MAX(blocks),
+                MAX(turnovers), MAX(points)
+                FROM athlete_stats;
         """)
     )
-    print("Completed materialized_view")
+    print("Completed max_athlete_stats")
 
+    conn.execute(
+        sqlalchemy.text("""
+            INSERT INTO team_season_stats
+            SELECT team_id, season,
+                   COUNT(*) FILTER (WHERE won), COUNT(*) FILTER (WHERE NOT won),
+                   SUM(points_for), SUM(points_allowed), SUM(rebounds), SUM(assists), SUM(steals), SUM(blocks)
+            FROM (
+                SELECT home AS team_id, season, pts_home > pts_away AS won, pts_home AS points_for,
+                       pts_away AS points_allowed, reb_home AS rebounds, ast_home AS assists, stl_home AS steals,
+                       blk_home AS blocks
+                FROM games
+                UNION ALL
+                SELECT away, season, pts_home <= pts_away, pts_away, pts_home, reb_away, ast_away, stl_away, blk_away
+                FROM games
+            ) AS team_games
+            GROUP BY team_id, season;
+        """)
+    )
+    print("Completed team_season_stats")
+
+
+    for stats, ratings, id_column in [("team_rating_stats", "team_ratings", "team_id"),
+                                      ("athlete_rating_stats", "athlete_ratings", "athlete_id")]:
+        conn.execute(
+            sqlalchemy.text(f"""
+                INSERT INTO {stats}
+                SELECT {id_column}, SUM(rating), COUNT(*),
+                       COUNT(*) FILTER (WHERE rating = 1), COUNT(*) FILTER (WHERE rating = 2),
+                       COUNT(*) FILTER (WHERE rating = 3), COUNT(*) FILTER (WHERE rating = 4),
+                       COUNT(*) FILTER (WHERE rating = 5)
+                FROM {ratings}
+                GROUP BY {id_column};
+            """)
+        )
+    print("Completed team_rating_stats and athlete_rating_stats")
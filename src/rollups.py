@@ -0,0 +1,283 @@
+"""
+Derived tables that are maintained incrementally by the write endpoints,
+plus commands to rebuild them from the raw rows, or to check the rating totals against them:
+
+    python -m src.rollups rebuild [--season 2023 ...]
+    python -m src.rollups reconcile
+"""
+import argparse
+import sys
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
+
+from src import database as db
+
+TEAM_SEASON_TOTALS = ["wins", "losses", "points_for", "points_allowed", "rebounds", "assists", "steals", "blocks"]
+MAX_ATHLETE_STATS = ["games_played", "minutes_played", "field_goal_percentage", "free_throw_percentage",
+                     "total_rebounds", "assists", "steals", "blocks", "turnovers", "points"]
+RATING_LEVELS = range(1, 6)
+RATING_TOTALS = ["rating_sum", "rating_count", *[f"rating_{level}" for level in RATING_LEVELS]]
+
+
+def team_season_totals(*where):
+    """
+    Per (team_id, season) totals over the games matching `where`,
+    with every game counted once for each of its two teams. Ties go to the away team.
+    """
+    games = db.games.c
+    home = sqlalchemy.select(
+        games.home.label("team_id"), games.season,
+        (games.pts_home > games.pts_away).label("won"),
+        games.pts_home.label("points_for"), games.pts_away.label("points_allowed"),
+        games.reb_home.label("rebounds"), games.ast_home.label("assists"),
+        games.stl_home.label("steals"), games.blk_home.label("blocks")
+    ).where(*where)
+    away = sqlalchemy.select(
+        games.away, games.season,
+        games.pts_home <= games.pts_away,
+        games.pts_away, games.pts_home,
+        games.reb_away, games.ast_away,
+        games.stl_away, games.blk_away
+    ).where(*where)
+    team_games = sqlalchemy.union_all(home, away).subquery()
+
+    return sqlalchemy.select(
+        team_games.c.team_id,
+        team_games.c.season,
+        sqlalchemy.func.count().filter(team_games.c.won).label("wins"),
+        sqlalchemy.func.count().filter(sqlalchemy.not_(team_games.c.won)).label("losses"),
+        *[sqlalchemy.func.sum(team_games.c[total]).label(total) for total in TEAM_SEASON_TOTALS[2:]]
+    ).group_by(team_games.c.team_id, team_games.c.season)
+
+
+def add_to_team_season_stats(*where):
+    """Upsert that adds the games matching `where` onto team_season_stats."""
+    insert = postgresql.insert(db.team_season_stats).from_select(
+        ["team_id", "season", *TEAM_SEASON_TOTALS], team_season_totals(*where))
+    return insert.on_conflict_do_update(
+        index_elements=["team_id", "season"],
+        set_={total: db.team_season_stats.c[total] + insert.excluded[total] for total in TEAM_SEASON_TOTALS}
+    )
+
+
+# the ids go over as one array parameter, so any number of games fits in a single statement
+_add_games_to_team_season_stats = add_to_team_season_stats(db.games.c.game_id == sqlalchemy.any_(
+    sqlalchemy.bindparam("game_ids", type_=postgresql.ARRAY(sqlalchemy.Integer))))
+
+
+async def update_team_season_stats(conn, game_ids):
+    """Adds newly inserted games to team_season_stats, in the caller's transaction."""
+    await conn.execute(_add_games_to_team_season_stats, {"game_ids": list(game_ids)})
+
+
+def rebuild_team_season_stats(conn, seasons=None):
+    """Recomputes team_season_stats from games, for every season or only the given ones."""
+    if seasons is None:
+        conn.execute(db.team_season_stats.delete())
+        conn.execute(add_to_team_season_stats())
+    else:
+        conn.execute(db.team_season_stats.delete().where(db.team_season_stats.c.season.in_(seasons)))
+        conn.execute(add_to_team_season_stats(db.games.c.season.in_(seasons)))
+
+
+def athlete_stats_maxima(*where, stats=db.athlete_stats):
+    """Maximum of every stat over the rows of `stats` (athlete_stats or a table like it) matching `where`."""
+    return sqlalchemy.select(
+        *[sqlalchemy.func.max(stats.c[stat]).label(stat) for stat in MAX_ATHLETE_STATS]
+    ).where(*where).subquery()
+
+
+def raise_max_athlete_stats(new):
+    """
+    Update that raises max_athlete_stats to the `new` maxima from athlete_stats_maxima.
+    The single row is only written (and locked) when a maximum grows.
+    """
+    maxima = db.max_athlete_stats.c
+    return (
+        db.max_athlete_stats.update()
+            .values({f"max_{stat}": sqlalchemy.func.greatest(maxima[f"max_{stat}"], new.c[stat])
+                     for stat in MAX_ATHLETE_STATS})
+            .where(sqlalchemy.or_(*[sqlalchemy.func.coalesce(new.c[stat] > maxima[f"max_{stat}"],
+                                                             new.c[stat].is_not(None))
+                                    for stat in MAX_ATHLETE_STATS]))
+    )
+
+
+# built once, since constructing and cache-keying this statement costs more than running it
+_raise_max_athlete_stats = raise_max_athlete_stats(athlete_stats_maxima(
+    sqlalchemy.tuple_(db.athlete_stats.c.athlete_id, db.athlete_stats.c.year).in_(
+        sqlalchemy.bindparam("athlete_seasons", expanding=True))))
+
+
+async def update_max_athlete_stats(conn, athlete_seasons):
+    """Raises max_athlete_stats for newly inserted (athlete_id, year) rows, in the caller's transaction."""
+    await conn.execute(_raise_max_athlete_stats, {"athlete_seasons": list(athlete_seasons)})
+
+
+async def update_max_athlete_stats_from(conn, stats):
+    """Raises max_athlete_stats for every row of `stats`, a table of newly inserted athlete_stats rows."""
+    await conn.execute(raise_max_athlete_stats(athlete_stats_maxima(stats=stats)))
+
+
+def rebuild_max_athlete_stats(conn):
+    """
+    Recomputes max_athlete_stats from athlete_stats. Needed after athlete_stats rows are
+    deleted or lowered, which the incremental update can't account for.
+    """
+    conn.execute(db.max_athlete_stats.delete())
+    conn.execute(db.max_athlete_stats.insert().from_select(
+        [f"max_{stat}" for stat in MAX_ATHLETE_STATS], sqlalchemy.select(athlete_stats_maxima())))
+
+
+def rating_totals(ratings, id_column):
+    """Per-entity sum, count and count of each level of the ratings in `ratings`."""
+    rating = ratings.c.rating
+    return sqlalchemy.select(
+        ratings.c[id_column],
+        sqlalchemy.func.sum(rating).label("rating_sum"),
+        sqlalchemy.func.count().label("rating_count"),
+        *[sqlalchemy.func.count().filter(rating == level).label(f"rating_{level}") for level in RATING_LEVELS]
+    ).group_by(ratings.c[id_column])
+
+
+def _add_on_conflict(insert, stats, id_column):
+    return insert.on_conflict_do_update(
+        index_elements=[id_column],
+        set_={total: stats.c[total] + insert.excluded[total] for total in RATING_TOTALS}
+    )
+
+
+def add_to_rating_stats(stats, id_column):
+    """Upsert that adds one rating (bound as `id` and `rating`) onto `stats`."""
+    rating = sqlalchemy.bindparam("rating", type_=sqlalchemy.Integer)
+    insert = postgresql.insert(stats).values({
+        id_column: sqlalchemy.bindparam("id", type_=sqlalchemy.Integer),
+        "rating_sum": rating,
+        "rating_count": 1,
+        **{f"rating_{level}": sqlalchemy.case((rating == level, 1), else_=0) for level in RATING_LEVELS}
+    })
+    return _add_on_conflict(insert, stats, id_column)
+
+
+def new_ratings(id_column):
+    """Rows of (`id_column`, rating) from the arrays bound as `ids` and `ratings`."""
+    int_array = postgresql.ARRAY(sqlalchemy.Integer)
+    return sqlalchemy.select(
+        sqlalchemy.func.unnest(sqlalchemy.cast(sqlalchemy.bindparam("ids"), int_array)).label(id_column),
+        sqlalchemy.func.unnest(sqlalchemy.cast(sqlalchemy.bindparam("ratings"), int_array)).label("rating")
+    ).subquery()
+
+
+def add_many_to_rating_stats(stats, id_column):
+    """
+    Upsert that adds the ratings bound as the arrays `ids` and `ratings` onto `stats`.
+    Rows are written in id order, so concurrent batches lock them in the same order and can't deadlock.
+    """
+    totals = rating_totals(new_ratings(id_column), id_column)
+    insert = postgresql.insert(stats).from_select(
+        [id_column, *RATING_TOTALS], totals.order_by(totals.selected_columns[0]))
+    return _add_on_conflict(insert, stats, id_column)
+
+
+# (raw ratings, totals, id column) for teams and athletes
+RATING_STATS = {
+    "team_rating_stats": (db.team_ratings, db.team_rating_stats, "team_id"),
+    "athlete_rating_stats": (db.athlete_ratings, db.athlete_rating_stats, "athlete_id"),
+}
+
+_add_team_rating = add_to_rating_stats(db.team_rating_stats, "team_id")
+_add_athlete_rating = add_to_rating_stats(db.athlete_rating_stats, "athlete_id")
+_add_many_to_rating_stats = {name: add_many_to_rating_stats(stats, id_column)
+                             for name, (_, stats, id_column) in RATING_STATS.items()}
+
+
+async def update_team_rating_stats(conn, team_id, rating):
+    """Adds a newly inserted team rating to team_rating_stats, in the caller's transaction."""
+    await conn.execute(_add_team_rating, {"id": team_id, "rating": rating})
+
+
+async def update_athlete_rating_stats(conn, athlete_id, rating):
+    """Adds a newly inserted athlete rating to athlete_rating_stats, in the caller's transaction."""
+    await conn.execute(_add_athlete_rating, {"id": athlete_id, "rating": rating})
+
+
+async def update_rating_stats_many(conn, name, ids, ratings):
+    """
+    Adds newly inserted ratings, given as parallel lists of ids and ratings, to the rating totals
+    table `name`, in the caller's transaction.
+    """
+    await conn.execute(_add_many_to_rating_stats[name], {"ids": list(ids), "ratings": list(ratings)})
+
+
+def rebuild_rating_stats(conn):
+    """Recomputes team_rating_stats and athlete_rating_stats from the raw ratings."""
+    for ratings, stats, id_column in RATING_STATS.values():
+        conn.execute(stats.delete())
+        conn.execute(stats.insert().from_select([id_column, *RATING_TOTALS], rating_totals(ratings, id_column)))
+
+
+def rating_stats_mismatches(conn, name):
+    """
+    The rows of the rating totals table `name` that differ from the raw ratings, as
+    (id, stored totals, actual totals), with None for a missing row. Run in one snapshot,
+    so ratings added concurrently (each in the same transaction as its totals) can't show up as drift.
+    """
+    ratings, stats, id_column = RATING_STATS[name]
+    actual = rating_totals(ratings, id_column).subquery()
+    id = sqlalchemy.func.coalesce(stats.c[id_column], actual.c[id_column])
+    stmt = sqlalchemy.select(
+        id,
+        *[stats.c[total] for total in RATING_TOTALS],
+        *[actual.c[total] for total in RATING_TOTALS]
+    ).select_from(
+        stats.join(actual, stats.c[id_column] == actual.c[id_column], full=True)
+    ).where(
+        sqlalchemy.or_(*[stats.c[total].is_distinct_from(actual.c[total]) for total in RATING_TOTALS])
+    ).order_by(id)
+
+    mismatches = []
+    for row in conn.execute(stmt).all():
+        stored, found = row[1:len(RATING_TOTALS) + 1], row[len(RATING_TOTALS) + 1:]
+        mismatches.append((
+            row[0],
+            None if stored[0] is None else dict(zip(RATING_TOTALS, stored)),
+            None if found[0] is None else dict(zip(RATING_TOTALS, found))
+        ))
+    return mismatches
+
+
+def reconcile(conn):
+    """Prints every rating total that disagrees with the raw ratings. Returns whether all of them agree."""
+    consistent = True
+    for name in RATING_STATS:
+        mismatches = rating_stats_mismatches(conn, name)
+        for id, stored, actual in mismatches:
+            print(f"{name} {id}: stored {stored}, actual {actual}")
+        print(f"{name}: {len(mismatches)} mismatched rows")
+        consistent = consistent and not mismatches
+    return consistent
+
+
+def rebuild(conn, seasons=None):
+    rebuild_team_season_stats(conn, seasons)
+    print("Rebuilt team_season_stats")
+    rebuild_max_athlete_stats(conn)
+    print("Rebuilt max_athlete_stats")
+    rebuild_rating_stats(conn)
+    print("Rebuilt team_rating_stats and athlete_rating_stats")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild", "reconcile"])
+    parser.add_argument("--season", type=int, action="append", help="only rebuild these seasons")
+    args = parser.parse_args()
+
+    with db.engine.begin() as conn:
+        if args.command == "reconcile":
+            if not reconcile(conn):
+                print("run `python -m src.rollups rebuild` to repair them")
+                sys.exit(1)
+        else:
+            rebuild(conn, args.season)
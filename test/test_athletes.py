@@ -4,8 +4,14 @@ from fastapi import APIRouter, HTTPException
 from src.api.server import app
 from src.api.athletes import AthleteStats, AthleteJson, add_athlete, add_athlete_season
 from src import database as db
+from src import rollups
+from src.api import name_index
+from src.api.name_index import NameIndex
 
+import asyncio
 import json
+import random
+import sqlalchemy
 
 client = TestClient(app)
 
@@ -23,6 +29,16 @@ def test_get_athlete_404():
     assert response.status_code == 404
 
 
+def test_get_athlete_year_without_stats():
+    seasons = client.get("/athletes/5").json()["stats"]
+    assert [season["year"] for season in seasons] == sorted(season["year"] for season in seasons)
+
+    missing = ({2019, 2020, 2021, 2022, 2023} - {season["year"] for season in seasons}).pop()
+    response = client.get("/athletes/5", params={"year": missing})
+    assert response.status_code == 200
+    assert response.json()["stats"] == []
+
+
 def test_compare_athletes_1():
     response = client.get("/athletes/?year=2023&athlete_ids=0&athlete_ids=1&athlete_ids=2&athlete_ids=3&athlete_ids=4&stat=points")
     assert response.status_code == 200
@@ -43,13 +59,113 @@ def test_compare_athletes_400():
     assert response.status_code == 400
 
 
+def test_compare_athletes_multiple_stats():
+    missing = ({2019, 2020, 2021, 2022, 2023} -
+               {season["year"] for season in client.get("/athletes/5").json()["stats"]}).pop()
+    params = {"year": missing, "athlete_ids": [5, 0, 1, 2, 2], "stats": ["points", "assists"], "order_by": "assists"}
+    response = client.get("/athletes/compare_athletes/", params=params)
+    assert response.status_code == 200
+
+    athletes = response.json()
+    assert [athlete["athlete_id"] for athlete in athletes].count(2) == 1
+    athlete_5 = next(athlete for athlete in athletes if athlete["athlete_id"] == 5)
+    assert athlete_5["points"] is None and athlete_5["assists"] is None
+
+    assists = [athlete["assists"] for athlete in athletes]
+    known = [value for value in assists if value is not None]
+    assert assists == sorted(known, reverse=True) + [None] * (len(assists) - len(known))
+
+
+def test_compare_athletes_cap():
+    response = client.get("/athletes/compare_athletes/", params={"year": 2023, "athlete_ids": list(range(1001))})
+    assert response.status_code == 400
+
+
+def test_leaders():
+    response = client.get("/athletes/leaders/", params={"year": 2022, "stat": "assists", "k": 20})
+    assert response.status_code == 200
+    leaders = response.json()
+
+    with db.engine.begin() as conn:
+        expected = conn.execute(
+            sqlalchemy.select(db.athlete_stats.c.athlete_id, db.athlete_stats.c.assists)
+            .where(db.athlete_stats.c.year == 2022)
+            .order_by(db.athlete_stats.c.assists.desc(), db.athlete_stats.c.athlete_id).limit(20)).fetchall()
+    assert [(leader["athlete_id"], leader["assists"]) for leader in leaders] == [tuple(row) for row in expected]
+
+    assert client.get("/athletes/leaders/", params={"year": 2022, "k": 101}).status_code == 422
+    assert client.get("/athletes/leaders/", params={"year": 2022, "k": 0}).status_code == 422
+
+
+def test_list_athletes_keyset():
+    first = client.get("/athletes/list_athletes/", params={"limit": 100, "pagination": "keyset"}).json()
+    second = client.get("/athletes/list_athletes/", params={"limit": 100, "cursor": first["next_cursor"]}).json()
+    offset = client.get("/athletes/list_athletes/", params={"limit": 200}).json()
+
+    assert first["results"] + second["results"] == offset
+
+
+def test_list_athletes_fuzzy():
+    response = client.get("/athletes/list_athletes/", params={"name": "Lebron Jmaes", "search": "fuzzy"})
+    assert response.status_code == 200
+
+    athletes = response.json()
+    assert athletes[0]["athlete name"] == "LeBron James"
+    scores = [athlete["score"] for athlete in athletes]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_autocomplete_athletes():
+    response = client.get("/athletes/autocomplete/", params={"q": "lebr"})
+    assert response.status_code == 200
+    assert {"athlete_id": 238, "name": "LeBron James"} in response.json()
+
+    names = [athlete["name"] for athlete in client.get("/athletes/autocomplete/", params={"q": "JOKI", "k": 3}).json()]
+    assert "Nikola Jokić" in names
+
+
+def test_name_index():
+    index = NameIndex(db.athletes, "athlete_id", "name")
+    index.add(2, "Added While Loading")
+    index.build([(0, "Anna Bell"), (1, "Bella Ann")])
+    index.add(3, "Bell Bottom")
+
+    assert 2 in index and len(index) == 4
+    assert index.prefix("bel", 10) == [(0, "Anna Bell"), (3, "Bell Bottom"), (1, "Bella Ann")]
+    assert index.prefix("bel", 1) == [(0, "Anna Bell")]
+    assert index.prefix("while", 10) == [(2, "Added While Loading")]
+
+
+def test_name_index_chunks(monkeypatch):
+    monkeypatch.setattr(name_index, "CHUNK_SIZE", 4)
+    random.seed(7)
+    words = ["al", "alma", "bo", "bob", "bobby", "cy", "cyan", "dee", "de la", "eve"]
+    rows = [(id, " ".join(random.choice(words) for _ in range(random.randint(1, 3)))) for id in range(300)]
+
+    built = NameIndex(db.athletes, "athlete_id", "name")
+    built.build(rows)
+    added = NameIndex(db.athletes, "athlete_id", "name")
+    added.build(rows[:20])
+    for id, name in rows[20:]:
+        added.add(id, name)
+    assert max(len(chunk) for chunk in added._key_chunks) <= 8
+
+    for query in ["a", "al", "alm", "b", "bob", "bobby", "c", "de", "de l", "e", "z", ""]:
+        expected = {}
+        for key, id in sorted((key, id) for id, name in rows for key in NameIndex._index_keys(name)):
+            if key.startswith(query):
+                expected.setdefault(id, dict(rows)[id])
+        for k in (1, 5, 1000):
+            assert built.prefix(query, k) == added.prefix(query, k) == list(expected.items())[:k]
+
+
 def test_add_athlete():
     with db.engine.begin() as conn:
-        athlete_id = add_athlete("Test Athlete")
+        athlete_id = asyncio.run(add_athlete("Test Athlete"))
         stats = AthleteStats(games_played=0, minutes_played=0, field_goal_percentage=0.0,
                              free_throw_percentage=0.0, total_rebounds=0, assists=0, steals=0, blocks=0, turnovers=0, points=0)
         athlete_json = AthleteJson(athlete_id=athlete_id, age=0, year=2023, team_id=0, stats=stats)
-        add_athlete_season(athlete_json)
+        asyncio.run(add_athlete_season(athlete_json))
 
         response = client.get("/athletes/" + str(athlete_id))
         assert response.status_code == 200
@@ -65,9 +181,103 @@ def test_add_athlete():
         )
 
 
+def test_add_season_raises_max_athlete_stats():
+    with db.engine.begin() as conn:
+        before = conn.execute(sqlalchemy.select(db.max_athlete_stats)).one()
+    athlete_id = asyncio.run(add_athlete("Max Stats Athlete"))
+    stats = dict(games_played=1, minutes_played=1, field_goal_percentage=0.5, free_throw_percentage=0.5,
+                 total_rebounds=1, assists=1, steals=1, blocks=1, turnovers=1, points=before.max_points + 1)
+    try:
+        response = client.post("/athletes/season", json={"athlete_id": athlete_id, "age": 30, "year": 2023,
+                                                         "team_id": 0, "stats": stats})
+        assert response.status_code == 200
+
+        with db.engine.begin() as conn:
+            after = conn.execute(sqlalchemy.select(db.max_athlete_stats)).one()
+        assert after.max_points == before.max_points + 1
+        assert {**after._asdict(), "max_points": before.max_points} == before._asdict()
+    finally:
+        with db.engine.begin() as conn:
+            conn.execute(db.athlete_stats.delete().where(db.athlete_stats.c.athlete_id == athlete_id))
+            conn.execute(db.athletes.delete().where(db.athletes.c.athlete_id == athlete_id))
+            rollups.rebuild_max_athlete_stats(conn)
+            assert conn.execute(sqlalchemy.select(db.max_athlete_stats)).one() == before
+
+
+def test_add_seasons_bulk():
+    athlete_id = asyncio.run(add_athlete("Bulk Seasons Athlete"))
+    stats = dict(games_played=1, minutes_played=1, field_goal_percentage=0.5, free_throw_percentage=0.5,
+                 total_rebounds=1, assists=1, steals=1, blocks=1, turnovers=1, points=1)
+    header = ",".join(["athlete_id", "year", "age", "team_id", *stats])
+    values = ",".join(str(value) for value in stats.values())
+    csv_body = "\n".join([
+        header,
+        f"{athlete_id},2019,30,0,{values}",
+        f"{athlete_id},2019,30,0,{values}",       # duplicate of line 2
+        f"100001,2019,30,0,{values}",              # no such athlete
+        f"{athlete_id},2030,30,0,{values}",        # year out of range
+        f"{athlete_id},2020,30,0,x,{values[2:]}",  # not a number
+    ])
+    try:
+        response = client.post("/athletes/season/bulk", content=csv_body, headers={"content-type": "text/csv"})
+        assert response.status_code == 200
+        assert response.json()["inserted"] == 1
+        assert [error["line"] for error in response.json()["errors"]] == [3, 4, 5, 6]
+
+        ndjson_body = "\n".join(json.dumps({"athlete_id": athlete_id, "age": 30, "year": year, "team_id": 0,
+                                            "stats": stats}) for year in (2019, 2020, 2021))
+        response = client.post("/athletes/season/bulk?atomic=true", content=ndjson_body,
+                                headers={"content-type": "application/x-ndjson"})
+        assert response.status_code == 400  # 2019 already exists, so nothing is added
+
+        response = client.post("/athletes/season/bulk", content=ndjson_body,
+                               headers={"content-type": "application/x-ndjson"})
+        assert response.status_code == 200
+        assert response.json() == {"inserted": 2, "error_count": 1,
+                                   "errors": [{"line": 1, "error": f"athlete {athlete_id} already has a season for 2019"}]}
+
+        with db.engine.begin() as conn:
+            years = conn.execute(sqlalchemy.select(db.athlete_stats.c.year)
+                                 .where(db.athlete_stats.c.athlete_id == athlete_id)).scalars().all()
+        assert sorted(years) == [2019, 2020, 2021]
+    finally:
+        with db.engine.begin() as conn:
+            conn.execute(db.athlete_stats.delete().where(db.athlete_stats.c.athlete_id == athlete_id))
+            conn.execute(db.athletes.delete().where(db.athletes.c.athlete_id == athlete_id))
+
+
+def test_add_seasons_bulk_invalid_utf8():
+    header = b"athlete_id,year,age,team_id,games_played,minutes_played,field_goal_percentage," \
+             b"free_throw_percentage,total_rebounds,assists,steals,blocks,turnovers,points"
+    response = client.post("/athletes/season/bulk", content=header + b"\n1,2019,\xff\xfe\n",
+                           headers={"content-type": "text/csv"})
+    assert response.status_code == 200
+    assert response.json() == {"inserted": 0, "error_count": 1, "errors": [{"line": 2, "error": "not valid UTF-8"}]}
+
+    response = client.post("/athletes/season/bulk", content=b'{"athlete_id": "\xc3"}',
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.json()["errors"] == [{"line": 1, "error": "not valid UTF-8"}]
+
+
+def test_add_seasons_bulk_inexact_numbers():
+    stats = dict(games_played=1, minutes_played=1, field_goal_percentage=0.5, free_throw_percentage=0.5,
+                 total_rebounds=1, assists=1, steals=1, blocks=1, turnovers=1, points=1)
+    seasons = [{"athlete_id": 1, "age": 30, "year": 2019, "team_id": 0, "stats": {**stats, "points": 12.7}},
+               {"athlete_id": 1, "age": 30, "year": 2019, "team_id": 0, "stats": {**stats, "assists": True}},
+               {"athlete_id": 1, "age": 30, "year": 2019, "team_id": 0,
+                "stats": {**stats, "free_throw_percentage": False}}]
+    response = client.post("/athletes/season/bulk?atomic=true", content="\n".join(map(json.dumps, seasons)),
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 400
+    assert response.json()["detail"]["errors"] == [{"line": 1, "error": "invalid points: 12.7"},
+                                                   {"line": 2, "error": "invalid assists: True"},
+                                                   {"line": 3, "error": "invalid free_throw_percentage: False"}]
+
+
 def test_add_athlete_400():
     try:
-        add_athlete(name="Stephen Curry")
+        asyncio.run(add_athlete(name="Stephen Curry"))
         assert False
     except HTTPException:
         pass
@@ -80,7 +290,7 @@ def test_add_season_errors():
     # Invalid athlete_id
     athlete_json = AthleteJson(athlete_id=100001, age=0, year=2023, team_id=0, stats=stats)
     try:
-        add_athlete_season(athlete_json)
+        asyncio.run(add_athlete_season(athlete_json))
         assert False
     except HTTPException:
         pass
@@ -88,7 +298,7 @@ def test_add_season_errors():
     # Invalid team_id
     athlete_json = AthleteJson(athlete_id=0, age=0, year=2023, team_id=100, stats=stats)
     try:
-        add_athlete_season(athlete_json)
+        asyncio.run(add_athlete_season(athlete_json))
         assert False
     except HTTPException:
         pass
@@ -96,7 +306,7 @@ def test_add_season_errors():
     # Athlete year pair already exists
     athlete_json = AthleteJson(athlete_id=0, age=0, year=2023, team_id=0, stats=stats)
     try:
-        add_athlete_season(athlete_json)
+        asyncio.run(add_athlete_season(athlete_json))
         assert False
     except HTTPException:
         pass
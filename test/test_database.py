@@ -0,0 +1,114 @@
+import asyncio
+import datetime
+import os
+
+import pytest
+import sqlalchemy
+from fastapi.testclient import TestClient
+
+from src.api.server import app
+from src import database as db
+from src.api.athletes import add_athlete
+from src.api.games import GameJson, add_game
+
+client = TestClient(app)
+
+# Run against two local Postgres instances by pointing POSTGRES_REPLICA_SERVER/PORT at the second one
+replica_configured = pytest.mark.skipif(not os.environ.get("POSTGRES_REPLICA_SERVER"),
+                                        reason="no replica configured")
+
+
+async def server_port(conn):
+    return (await conn.execute(sqlalchemy.text("SELECT current_setting('port')"))).scalar_one()
+
+
+async def show(conn, setting):
+    return (await conn.execute(sqlalchemy.text(f"SHOW {setting}"))).scalar_one()
+
+
+def test_reader_is_read_committed_and_read_only():
+    async def check():
+        async with db.reader() as conn:
+            assert await show(conn, "transaction_isolation") == "read committed"
+            assert await show(conn, "transaction_read_only") == "on"
+        async with db.writer() as conn:
+            assert await show(conn, "transaction_isolation") == "serializable"
+
+    asyncio.run(check())
+
+
+def test_reader_falls_back_to_primary(monkeypatch):
+    monkeypatch.delenv("POSTGRES_REPLICA_SERVER", raising=False)
+
+    async def check():
+        assert db.get_async_replica_engine() is None
+        async with db.reader() as conn:
+            assert await server_port(conn) == os.environ.get("POSTGRES_PORT")
+
+    asyncio.run(check())
+
+
+@replica_configured
+def test_reader_uses_replica():
+    async def check():
+        async with db.reader() as conn:
+            assert await server_port(conn) == os.environ.get("POSTGRES_REPLICA_PORT", os.environ.get("POSTGRES_PORT"))
+
+    asyncio.run(check())
+
+
+@replica_configured
+def test_write_pins_reads_to_primary():
+    async def check():
+        async with db.writer():
+            pass
+        async with db.reader() as conn:
+            assert await server_port(conn) == os.environ.get("POSTGRES_PORT")
+
+    asyncio.run(check())
+
+
+@replica_configured
+def test_write_sets_read_your_writes_cookie():
+    response = client.post("/teamratings/", json={"id": 1, "rating": 3})
+    assert response.status_code == 200
+    assert response.cookies.get("read_your_writes") == "1"
+
+    pinned = TestClient(app, cookies={"read_your_writes": "1"})
+    assert pinned.get("/teams/1").status_code == 200
+
+
+def test_concurrent_writers_do_not_abort(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "50")
+    # season 2031, which has no other games, so the rollup row can be checked and removed afterwards
+    game = GameJson(home_team_id=1, away_team_id=2, date=datetime.date(2031, 1, 1), points_home=100, points_away=90,
+                    rebounds_home=40, rebounds_away=40, assists_home=20, assists_away=20, steals_home=5,
+                    steals_away=5, blocks_home=5, blocks_away=5)
+    names = [f"Concurrent Writer {i}" for i in range(50)]
+
+    async def write():
+        game_ids = await asyncio.gather(*(add_game(game) for _ in range(50)), return_exceptions=True)
+        athlete_ids = await asyncio.gather(*(add_athlete(name) for name in names), return_exceptions=True)
+        # the same new name from many writers at once is added exactly once
+        duplicates = await asyncio.gather(*(add_athlete("Concurrent Duplicate") for _ in range(10)),
+                                          return_exceptions=True)
+        await db.dispose_engines()
+        return game_ids, athlete_ids, duplicates
+
+    game_ids, athlete_ids, duplicates = asyncio.run(write())
+    try:
+        assert not [error for error in game_ids + athlete_ids if isinstance(error, Exception)]
+        assert len(set(game_ids)) == 50 and len(set(athlete_ids)) == 50
+        assert len([id for id in duplicates if isinstance(id, int)]) == 1
+
+        with db.engine.begin() as conn:
+            wins, losses = conn.execute(sqlalchemy.select(db.team_season_stats.c.wins, db.team_season_stats.c.losses)
+                                        .where((db.team_season_stats.c.season == 2031) &
+                                               (db.team_season_stats.c.team_id == 1))).one()
+        assert (wins, losses) == (50, 0)
+    finally:
+        with db.engine.begin() as conn:
+            conn.execute(db.games.delete().where(db.games.c.season == 2031))
+            conn.execute(db.team_season_stats.delete().where(db.team_season_stats.c.season == 2031))
+            conn.execute(db.athletes.delete().where(
+                db.athletes.c.name.in_(names + ["Concurrent Duplicate"])))
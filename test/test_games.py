@@ -5,6 +5,7 @@ from src.api.games import add_game
 from src.api.teams import team_options
 from src import database as db
 import datetime
+import sqlalchemy
 
 import json
 
@@ -46,3 +47,146 @@ def test_add_game():
 def test_add_game_same_team():
     response = client.get("/games/?home_team=Toronto%20Raptors&away_team=Toronto%20Raptors")
     assert response.status_code == 400
+
+
+def test_get_game_filters():
+    matchup = {"home_team_id": 1, "away_team_id": 2}
+    games = client.get("/games/", params=matchup).json()
+    home_team = games[0]["home_team"]
+
+    winners = client.get("/games/", params={**matchup, "winner": "home"}).json()
+    assert winners == [game for game in games if game["winner"] == home_team]
+
+    since, until = games[1]["date"], games[-2]["date"]
+    in_range = client.get("/games/", params={**matchup, "since": since, "until": until}).json()
+    assert in_range == [game for game in games if since <= game["date"] <= until]
+
+    both = client.get("/games/", params={**matchup, "both_directions": True}).json()
+    reverse = client.get("/games/", params={"home_team_id": 2, "away_team_id": 1}).json()
+    assert both == sorted(games + reverse, key=lambda game: (game["date"], game["game_id"]))
+
+
+def test_get_game_filter_matches_nothing():
+    games = db.games.c
+    with db.engine.begin() as conn:
+        home, away = conn.execute(
+            sqlalchemy.select(games.home, games.away).group_by(games.home, games.away)
+            .having(sqlalchemy.func.count().filter(games.pts_home > games.pts_away) == 0)
+            .order_by(games.home, games.away).limit(1)).one()
+    matchup = {"home_team_id": home, "away_team_id": away}
+
+    response = client.get("/games/", params={**matchup, "winner": "home"})
+    assert response.status_code == 200
+    assert response.json() == []
+    response = client.get("/games/", params={**matchup, "since": "2100-01-01", "limit": 10})
+    assert response.json() == {"results": [], "next_cursor": None}
+
+    # teams that never played each other are still a 404, filtered or not
+    assert client.get("/games/", params={"home_team_id": home, "away_team_id": 1000}).status_code == 404
+    assert client.get("/games/", params={"home_team_id": home, "away_team_id": 1000,
+                                         "winner": "home"}).status_code == 404
+
+
+def test_get_game_keyset():
+    matchup = {"home_team_id": 1, "away_team_id": 2, "both_directions": True}
+    games = client.get("/games/", params=matchup).json()
+
+    page = client.get("/games/", params={**matchup, "limit": 3}).json()
+    pages = page["results"]
+    while page["next_cursor"] is not None:
+        page = client.get("/games/", params={**matchup, "limit": 3, "cursor": page["next_cursor"]}).json()
+        pages += page["results"]
+    assert pages == games
+
+    assert client.get("/games/", params={**matchup, "cursor": "nonsense"}).status_code == 400
+
+
+def test_add_games_bulk():
+    # season 2033, which has no other games, so the rollup rows can be checked and removed afterwards
+    game = {"home_team_id": 1, "away_team_id": 2, "date": "2032-11-01", "points_home": 100, "points_away": 90,
+            "rebounds_home": 40, "rebounds_away": 40, "assists_home": 20, "assists_away": 20,
+            "steals_home": 5, "steals_away": 5, "blocks_home": 5, "blocks_away": 5}
+    uploaded = [game, {**game, "away_team_id": 1}, {**game, "home_team_id": 1000}, {**game, "date": "soon"}, game]
+    try:
+        response = client.post("/games/bulk", json=uploaded)
+        assert response.status_code == 200
+        game_ids = response.json()["game_ids"]
+        assert game_ids[1:4] == [None, None, None] and None not in (game_ids[0], game_ids[4])
+        assert [error["index"] for error in response.json()["errors"]] == [1, 2, 3]
+
+        ndjson = "\n".join(json.dumps(game) for game in uploaded)
+        response = client.post("/games/bulk?atomic=true", content=ndjson,
+                               headers={"content-type": "application/x-ndjson"})
+        assert response.status_code == 400
+
+        with db.engine.begin() as conn:
+            assert conn.execute(sqlalchemy.select(sqlalchemy.func.count()).where(
+                db.games.c.season == 2033)).scalar_one() == 2
+            wins = conn.execute(sqlalchemy.select(db.team_season_stats.c.wins).where(
+                (db.team_season_stats.c.season == 2033) & (db.team_season_stats.c.team_id == 1))).scalar_one()
+        assert wins == 2
+    finally:
+        with db.engine.begin() as conn:
+            conn.execute(db.games.delete().where(db.games.c.season == 2033))
+            conn.execute(db.team_season_stats.delete().where(db.team_season_stats.c.season == 2033))
+
+
+def test_add_games_bulk_non_objects():
+    response = client.post("/games/bulk", json=["oops", "", [1, 2]])
+    assert response.status_code == 200
+    assert response.json()["game_ids"] == [None, None, None]
+    assert response.json()["errors"] == [{"index": index, "error": "not a JSON object"} for index in range(3)]
+
+    response = client.post("/games/bulk", content='"oops"\n{bad',
+                           headers={"content-type": "application/x-ndjson"})
+    assert [error["error"] for error in response.json()["errors"]] == ["not a JSON object", "not valid JSON"]
+
+    response = client.post("/games/bulk", content=b'{"home_team_id": 1}\n{"date": "\xff"}\n',
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.json()["errors"] == [{"index": 0, "error": "missing away_team_id"},
+                                         {"index": 1, "error": "not valid UTF-8"}]
+
+
+def test_add_games_bulk_inexact_numbers():
+    game = {"home_team_id": 1, "away_team_id": 2, "date": "2032-11-01", "points_home": 100, "points_away": 90,
+            "rebounds_home": 40, "rebounds_away": 40, "assists_home": 20, "assists_away": 20,
+            "steals_home": 5, "steals_away": 5, "blocks_home": 5, "blocks_away": 5}
+    response = client.post("/games/bulk?atomic=true", json=[{**game, "points_home": 100.5},
+                                                            {**game, "steals_home": True}])
+    assert response.status_code == 400
+    assert response.json()["detail"]["errors"] == [{"index": 0, "error": "invalid points_home: 100.5"},
+                                                   {"index": 1, "error": "invalid steals_home: True"}]
+
+
+def test_add_game_invalid_team():
+    game = {"home_team_id": 1000, "away_team_id": 2, "date": "2032-11-01", "points_home": 100, "points_away": 90,
+            "rebounds_home": 40, "rebounds_away": 40, "assists_home": 20, "assists_away": 20,
+            "steals_home": 5, "steals_away": 5, "blocks_home": 5, "blocks_away": 5}
+    response = client.post("/games/add_game", json=game)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid home_team_id"
+
+
+def test_search_games():
+    season = {"since": "2022-10-01", "until": "2023-04-30"}
+    page = client.get("/games/search/", params={**season, "limit": 500}).json()
+    games = page["results"]
+    while page["next_cursor"] is not None:
+        page = client.get("/games/search/", params={**season, "limit": 500, "cursor": page["next_cursor"]}).json()
+        games += page["results"]
+
+    with db.engine.begin() as conn:
+        expected = conn.execute(sqlalchemy.select(db.games.c.game_id)
+                                .where(db.games.c.date.between(datetime.date(2022, 10, 1), datetime.date(2023, 4, 30)))
+                                .order_by(db.games.c.date, db.games.c.game_id)).scalars().all()
+    assert [game["game_id"] for game in games] == expected
+
+    team_name = games[0]["home_team"]
+    with db.engine.begin() as conn:
+        team_id = conn.execute(sqlalchemy.select(db.teams.c.team_id).where(db.teams.c.team_name == team_name)
+                               ).scalar_one()
+    team_games = client.get("/games/search/", params={**season, "team_id": team_id, "limit": 1000}).json()["results"]
+    assert team_games == [game for game in games if team_name in (game["home_team"], game["away_team"])]
+
+    assert client.get("/games/search/", params={"since": "2019-01-01", "until": "2023-01-01"}).status_code == 400
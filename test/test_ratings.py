@@ -1,9 +1,16 @@
+import asyncio
+from types import SimpleNamespace
+
+import sqlalchemy
 from fastapi.testclient import TestClient
 from fastapi import HTTPException
 
 from src.api.server import app
 from src.api.ratings import *
+from src.api.prediction_utils import mean_rating_of
+from src.api import name_index, rating_buffer
 from src import database as db
+from src import rollups
 
 client = TestClient(app)
 
@@ -38,3 +45,153 @@ def test_add_athlete_rating_404():
     }
     response = client.post("/athleteratings/", json=reqbody)
     assert response.status_code == 404
+
+def test_rating_stats():
+    with db.engine.begin() as conn:
+        before = conn.execute(sqlalchemy.select(db.team_rating_stats).where(
+            db.team_rating_stats.c.team_id == 1)).one_or_none()
+        last_rating_id = conn.execute(sqlalchemy.select(sqlalchemy.func.max(db.team_ratings.c.team_rating_id))).scalar()
+    try:
+        for rating in [5, 5, 2]:
+            response = client.post("/teamratings/", json={"id": 1, "rating": rating})
+            assert response.status_code == 200
+
+        with db.engine.begin() as conn:
+            after = conn.execute(sqlalchemy.select(db.team_rating_stats).where(
+                db.team_rating_stats.c.team_id == 1)).one()
+            assert rollups.rating_stats_mismatches(conn, "team_rating_stats") == []
+        before = before._asdict() if before else dict.fromkeys(rollups.RATING_TOTALS, 0)
+        assert after.rating_sum == before["rating_sum"] + 12
+        assert after.rating_count == before["rating_count"] + 3
+        assert after.rating_5 == before["rating_5"] + 2
+        assert after.rating_2 == before["rating_2"] + 1
+        assert after.rating_1 == before["rating_1"]
+    finally:
+        with db.engine.begin() as conn:
+            conn.execute(db.team_ratings.delete().where(db.team_ratings.c.team_rating_id > (last_rating_id or 0)))
+            rollups.rebuild_rating_stats(conn)
+
+
+def test_rating_stats_mismatches():
+    with db.engine.begin() as conn:
+        athlete_id = conn.execute(sqlalchemy.select(sqlalchemy.func.min(db.athletes.c.athlete_id))).scalar()
+        last_rating_id = conn.execute(
+            sqlalchemy.select(sqlalchemy.func.max(db.athlete_ratings.c.athlete_rating_id))).scalar()
+    try:
+        response = client.post("/athleteratings/", json={"id": athlete_id, "rating": 4})
+        assert response.status_code == 200
+
+        with db.engine.begin() as conn:
+            assert rollups.rating_stats_mismatches(conn, "athlete_rating_stats") == []
+            # a rating written around the endpoint shows up as drift
+            conn.execute(db.athlete_ratings.insert().values(athlete_id=athlete_id, rating=1))
+            [(id, stored, actual)] = rollups.rating_stats_mismatches(conn, "athlete_rating_stats")
+            assert id == athlete_id
+            assert actual["rating_count"] == stored["rating_count"] + 1
+            assert actual["rating_1"] == stored["rating_1"] + 1
+    finally:
+        with db.engine.begin() as conn:
+            conn.execute(db.athlete_ratings.delete().where(
+                db.athlete_ratings.c.athlete_rating_id > (last_rating_id or 0)))
+            rollups.rebuild_rating_stats(conn)
+
+
+def test_mean_rating_of():
+    assert mean_rating_of(None) == 3
+    assert mean_rating_of(SimpleNamespace(rating_sum=0, rating_count=0)) == 3
+    assert mean_rating_of(SimpleNamespace(rating_sum=9, rating_count=2)) == 4.5
+
+
+def test_rating_buffer():
+    with db.engine.begin() as conn:
+        last_rating_id = conn.execute(sqlalchemy.select(sqlalchemy.func.max(db.team_ratings.c.team_rating_id))).scalar()
+        athlete_id = conn.execute(sqlalchemy.select(sqlalchemy.func.min(db.athletes.c.athlete_id))).scalar()
+        last_athlete_rating_id = conn.execute(
+            sqlalchemy.select(sqlalchemy.func.max(db.athlete_ratings.c.athlete_rating_id))).scalar()
+
+    async def run():
+        await name_index.load_all()
+        names = []
+        # acknowledged once written: the rows are there as soon as add() returns
+        buffer = rating_buffer.RatingBuffer(ack_after_flush=True, flush_interval=0.01, batch_rows=3)
+        await buffer.start()
+        names += await asyncio.gather(*[buffer.add("team", 1, rating) for rating in [1, 2, 3, 4, 5]],
+                                      buffer.add("athlete", athlete_id, 5))
+        assert buffer.written == 6
+        assert await buffer.add("team", -1, 3) is None
+        await buffer.stop()
+
+        # acknowledged once queued: the rows are written by the time the buffer stops
+        buffer = rating_buffer.RatingBuffer(flush_interval=10, batch_rows=1000)
+        await buffer.start()
+        names += [await buffer.add("team", 1, 5) for _ in range(4)]
+        assert buffer.written == 0
+        await buffer.stop()
+        assert buffer.written == 4
+
+        await db.dispose_engines()
+        return names
+
+    try:
+        names = asyncio.run(run())
+        assert names == [name_index.team_names.names[1]] * 5 + [name_index.athlete_names.names[athlete_id]] + \
+            [name_index.team_names.names[1]] * 4
+        with db.engine.begin() as conn:
+            new_ratings = conn.execute(sqlalchemy.select(db.team_ratings.c.team_id, db.team_ratings.c.rating).where(
+                db.team_ratings.c.team_rating_id > (last_rating_id or 0))).all()
+            assert sorted(new_ratings) == [(1, 1), (1, 2), (1, 3), (1, 4)] + [(1, 5)] * 5
+            assert rollups.rating_stats_mismatches(conn, "team_rating_stats") == []
+            assert rollups.rating_stats_mismatches(conn, "athlete_rating_stats") == []
+    finally:
+        with db.engine.begin() as conn:
+            conn.execute(db.team_ratings.delete().where(db.team_ratings.c.team_rating_id > (last_rating_id or 0)))
+            conn.execute(db.athlete_ratings.delete().where(
+                db.athlete_ratings.c.athlete_rating_id > (last_athlete_rating_id or 0)))
+            rollups.rebuild_rating_stats(conn)
+
+
+class HeldRatingBuffer(rating_buffer.RatingBuffer):
+    """A buffer whose writes wait for `release`, so the queue can be filled while one is in progress."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.release = asyncio.Event()
+
+    async def _flush(self, batch):
+        await self.release.wait()
+        await super()._flush(batch)
+
+
+def test_rating_buffer_stop_with_full_queue():
+    with db.engine.begin() as conn:
+        last_rating_id = conn.execute(sqlalchemy.select(sqlalchemy.func.max(db.team_ratings.c.team_rating_id))).scalar()
+
+    async def run(ack_after_flush):
+        await name_index.team_names.load()
+        buffer = HeldRatingBuffer(ack_after_flush=ack_after_flush, flush_interval=0, batch_rows=1, max_size=1)
+        await buffer.start()
+        # one rating is being written, one is queued and the rest wait for room
+        adds = [asyncio.ensure_future(buffer.add("team", 1, 3)) for _ in range(5)]
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert buffer._putting == 3
+
+        stopping = asyncio.ensure_future(buffer.stop())
+        await asyncio.sleep(0)
+        assert await asyncio.wait_for(buffer.add("team", 1, 3), timeout=10) is None
+        buffer.release.set()
+        await asyncio.wait_for(asyncio.gather(stopping, *adds), timeout=10)
+        assert buffer.written == 5
+        await db.dispose_engines()
+
+    try:
+        for ack_after_flush in (False, True):
+            asyncio.run(run(ack_after_flush))
+        with db.engine.begin() as conn:
+            assert conn.execute(sqlalchemy.select(sqlalchemy.func.count()).where(
+                db.team_ratings.c.team_rating_id > (last_rating_id or 0))).scalar_one() == 10
+            assert rollups.rating_stats_mismatches(conn, "team_rating_stats") == []
+    finally:
+        with db.engine.begin() as conn:
+            conn.execute(db.team_ratings.delete().where(db.team_ratings.c.team_rating_id > (last_rating_id or 0)))
+            rollups.rebuild_rating_stats(conn)
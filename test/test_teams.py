@@ -1,8 +1,11 @@
 from fastapi.testclient import TestClient
 
 from src.api.server import app
+from src import database as db
+from src import rollups
 
 import json
+import sqlalchemy
 
 client = TestClient(app)
 
@@ -102,3 +105,90 @@ def test_compare_teams6():
 
     with open("test/teams/pelicans_hornets_celtics_rockets.json", encoding="utf-8") as f:
         assert response.json() == json.load(f)
+
+
+def test_team_season_stats_matches_games():
+    with db.engine.begin() as conn:
+        expected = conn.execute(rollups.team_season_totals()).fetchall()
+        actual = conn.execute(sqlalchemy.select(
+            db.team_season_stats.c.team_id, db.team_season_stats.c.season,
+            *[db.team_season_stats.c[total] for total in rollups.TEAM_SEASON_TOTALS]
+        )).fetchall()
+
+    assert sorted(actual) == sorted(expected)
+
+
+def explain(stmt):
+    # sequential scans are priced out, so an index only appears in the plan if the predicate can use it
+    with db.engine.begin() as conn:
+        conn.execute(sqlalchemy.text("SET LOCAL enable_seqscan = off"))
+        sql = stmt.compile(conn, compile_kwargs={"literal_binds": True})
+        return "\n".join(conn.execute(sqlalchemy.text(f"EXPLAIN {sql}")).scalars())
+
+
+def test_season_filter_uses_index():
+    plan = explain(rollups.team_season_totals(db.games.c.season.in_([2022, 2023])))
+    assert "ix_games_season" in plan
+
+
+def test_compare_teams_uses_games_played():
+    params = {"team_ids": list(range(30)), "compare_by": ["points", "blocks"],
+              "since_season": 2021, "until_season": 2022}
+    response = client.get("/teams/compare_teams/", params=params)
+    assert response.status_code == 200
+    teams = response.json()
+    assert len(teams) == 30
+
+    with db.engine.begin() as conn:
+        for team in teams[:3]:
+            played, points = conn.execute(
+                sqlalchemy.select(sqlalchemy.func.count(), sqlalchemy.func.sum(sqlalchemy.case(
+                    (db.games.c.home == team["team_id"], db.games.c.pts_home), else_=db.games.c.pts_away)))
+                .where(((db.games.c.home == team["team_id"]) | (db.games.c.away == team["team_id"])) &
+                       db.games.c.season.between(2021, 2022))
+            ).one()
+            assert team["games_played"] == played
+            assert team["points"] == round(points / played, 3)
+
+    points = [team["points"] for team in teams]
+    assert points == sorted(points, reverse=True)
+
+
+def test_standings():
+    response = client.get("/teams/standings/", params={"season": 2022})
+    assert response.status_code == 200
+    assert "max-age" in response.headers["cache-control"]
+    [season] = response.json()
+    assert season["season"] == 2022
+    standings = season["standings"]
+    assert len(standings) == 30
+
+    win_pcts = [team["win_pct"] for team in standings]
+    assert win_pcts == sorted(win_pcts, reverse=True)
+    assert standings[0]["rank"] == 1
+    assert sum(team["wins"] for team in standings) == sum(team["losses"] for team in standings)
+
+    team = client.get(f"/teams/{standings[0]['team_id']}", params={"year": 2022}).json()["team_stats"][0]
+    assert (team["wins"], team["losses"]) == (standings[0]["wins"], standings[0]["losses"])
+
+    cached = client.get("/teams/standings/", params={"season": 2022},
+                        headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+
+def test_list_teams_keyset():
+    offset_ids = [team["team_id"] for team in client.get("/teams/", params={"limit": 30}).json()]
+
+    keyset_ids, cursor = [], None
+    while True:
+        params = {"limit": 7, "pagination": "keyset"}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/teams/", params=params).json()
+        keyset_ids += [team["team_id"] for team in page["results"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert keyset_ids == offset_ids == sorted(offset_ids)
+    assert client.get("/teams/", params={"cursor": "not a cursor"}).status_code == 400